@@ -1,6 +1,7 @@
 from __future__ import annotations
 from enum import Enum, auto
 from View.View import View
+from View.RenderJobs import renderJobFromView
 from DataCapsule.DataCapsules import SmoothFunction2D, Label
 from scipy.optimize import curve_fit
 
@@ -14,17 +15,26 @@ class Controller:
         self._dataModel = None
         self._view = None
 
-    def startPlot(self, useTex = False):
-        self._view = View(useTex=useTex)
+    def startPlot(self, useTex = False, headless = None):
+        self._view = View(useTex=useTex, headless=headless)
 
     def subscribeToView(self, controller: Controller):
         self._view = controller._view
 
     def finishPlot(self, savepath=None):
-        self._view.plotAll(savepath=savepath)
+        return self._view.plotAll(savepath=savepath)
+
+    def updatePlot(self, savepath=None):
+        # Redraws only the data capsules added or replaced since finishPlot
+        self._view.update(savepath=savepath)
+
+    def renderJob(self, savepath):
+        """Returns a job describing the plot, to be rendered in another process with View.RenderJobs.renderAll,
+        instead of calling finishPlot."""
+        return renderJobFromView(self._view, savepath)
 
     def addOverlayFunction(self, func, params, NPoints=500, plotID=-1, label=None):
-        dataCapsule = SmoothFunction2D(lambda x: func(x, *params), NPoints, label=label)
+        dataCapsule = SmoothFunction2D(FunctionWithParameters(func, params), NPoints, label=label)
         self._view.addDatacapsuleToSubplot(dataCapsule, plotID)
 
     def fitFunction(self, func, params0, NPoints=500, plotID=-1, dataCapsuleID=-1, x0 = None, x1 = None, paramLabelID = None, overrideLabel=None, overrideLabelSILabel=None,
@@ -52,4 +62,18 @@ class Controller:
 
         self.addOverlayFunction(func, param, NPoints, plotID, label=label)
 
-        return param, pcov
\ No newline at end of file
+        return param, pcov
+
+
+class FunctionWithParameters():
+    """The function x -> func(x, *params). Unlike a lambda it can be pickled (if func can), so that overlays can be
+    rendered in other processes."""
+    def __init__(self, func, params):
+        self.func = func
+        self.params = params
+
+    def __call__(self, x):
+        return self.func(x, *self.params)
+
+    def __repr__(self):
+        return "{}{}".format(getattr(self.func, "__qualname__", self.func), tuple(self.params))
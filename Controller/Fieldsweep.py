@@ -10,14 +10,26 @@ from DataCapsule.DataCapsules import Label
 import numpy as np
 
 class Fieldsweep(Controller):
-    def __init__(self, deviceType, paths, invertVoltage=False):
+    def __init__(self, deviceType, paths, invertVoltage=False, progressCallback=None, follow=False,
+                 useColumnCache=False, loadWorkers=1):
+        # With follow, the files are still being written by a running measurement; see refresh()
+        # With useColumnCache, parsed files are cached on disk (see VectorMagnetModel) to load faster next time
+        # With loadWorkers > 1, that many processes parse the files in parallel
         super().__init__()
         if deviceType == DeviceTypes.Keithley:
-            self._dataModel = Keithley(paths, invertVoltage=invertVoltage)
+            self._dataModel = Keithley(paths, invertVoltage=invertVoltage, progressCallback=progressCallback,
+                                       follow=follow, useColumnCache=useColumnCache, loadWorkers=loadWorkers)
         elif deviceType == DeviceTypes.ZILockin:
-            self._dataModel = ZILockin(paths)
+            self._dataModel = ZILockin(paths, progressCallback=progressCallback, follow=follow,
+                                       useColumnCache=useColumnCache, loadWorkers=loadWorkers)
         elif deviceType == DeviceTypes.Synktek:
-            self._dataModel = Synktek(paths, invertVoltage=invertVoltage)
+            self._dataModel = Synktek(paths, invertVoltage=invertVoltage, progressCallback=progressCallback,
+                                      follow=follow, useColumnCache=useColumnCache, loadWorkers=loadWorkers)
+
+    def refresh(self, final=False):
+        """Loads the single measurements appended to the followed files since the last refresh, without re-parsing
+        the rest of the files. Returns the amount of new single measurements; plot again to show them."""
+        return self._dataModel.refresh(final=final)
 
     def plotLockinMagnitude(self, fieldAxisSweepType, overrideDecorator=None, plotID = None,
                             insetID = None, overrideLabel=None, sharex=None, sharey=None):
@@ -67,7 +79,7 @@ class Fieldsweep(Controller):
                 baseDecorator = Decorators.SQI_dVdI_z.value
             if fieldAxisSweepType == SweepTypes.T_SAMPLE:
                 baseDecorator = Decorators.Fieldsweep_Temperature_dVdI.value
-            dataCapsule = self._dataModel.sweepIdVdI(fieldAxisSweepType, deviceID=deviceID)
+            dataCapsule = self._dataModel.getSQI(fieldAxisSweepType, deviceID=deviceID, dVdI=True)
         else:
             plotType = PlotTypes.ColorPlot
             if fieldAxisSweepType == SweepTypes.B_X:
@@ -78,7 +90,7 @@ class Fieldsweep(Controller):
                 baseDecorator = Decorators.SQI_IV_z.value
             if fieldAxisSweepType == SweepTypes.T_SAMPLE:
                 baseDecorator = Decorators.Fieldsweep_Temperature_IV.value
-            dataCapsule = self._dataModel.sweepIV(fieldAxisSweepType, deviceID=deviceID)
+            dataCapsule = self._dataModel.getSQI(fieldAxisSweepType, deviceID=deviceID)
 
         if overrideDecorator is None:
             decorator = baseDecorator
@@ -94,11 +106,29 @@ class Fieldsweep(Controller):
 
     def plotIC(self, fieldAxisSweepType, fromdVdI=False, vThreshold = None, dVdIThreshold = None, deviceID=0,
                plotID = None, selection=None, sweepRange=None, overrideDecorator=None, positiveCurrents=True,
-               sharex=None, sharey=None):
-        if fromdVdI:
-            xIcDataCapsule = self._dataModel.ICFromIdVdI(fieldAxisSweepType, dVdIThreshold, deviceID = deviceID, selection=selection, sweepRange=sweepRange, positiveCurrent=positiveCurrents)
+               sharex=None, sharey=None, bothPolarities=False, interpolate=False):
+        """With bothPolarities, Ic+ and Ic- are extracted together and plotted as two curves; positiveCurrents is
+        then ignored. With interpolate, the threshold crossing is linearly interpolated between current steps."""
+        if bothPolarities:
+            if fromdVdI:
+                IcPlus, IcMinus = self._dataModel.ICsFromIdVdI(fieldAxisSweepType, dVdIThreshold, deviceID=deviceID,
+                                                               selection=selection, sweepRange=sweepRange,
+                                                               interpolate=interpolate)
+            else:
+                IcPlus, IcMinus = self._dataModel.ICsFromIV(fieldAxisSweepType, vThreshold, deviceID=deviceID,
+                                                            selection=selection, sweepRange=sweepRange,
+                                                            interpolate=interpolate)
+            IcPlus.label = Label(labeltext=r"$I_c^+$")
+            IcMinus.label = Label(labeltext=r"$I_c^-$")
+            xIcDataCapsules = [IcPlus, IcMinus]
+        elif fromdVdI:
+            xIcDataCapsules = [self._dataModel.ICFromIdVdI(fieldAxisSweepType, dVdIThreshold, deviceID=deviceID,
+                                                           selection=selection, sweepRange=sweepRange,
+                                                           positiveCurrent=positiveCurrents, interpolate=interpolate)]
         else:
-            xIcDataCapsule = self._dataModel.ICFromIV(fieldAxisSweepType, vThreshold, deviceID = deviceID, selection=selection, sweepRange=sweepRange, positiveCurrent=positiveCurrents)
+            xIcDataCapsules = [self._dataModel.ICFromIV(fieldAxisSweepType, vThreshold, deviceID=deviceID,
+                                                        selection=selection, sweepRange=sweepRange,
+                                                        positiveCurrent=positiveCurrents, interpolate=interpolate)]
 
         plotType = PlotTypes.Scatter2D
 
@@ -121,10 +151,11 @@ class Fieldsweep(Controller):
             self.startPlot()
 
         if plotID is None:
-            plotID = self._view.subplotFromDataCapsules([xIcDataCapsule], plotType, decorator, sharex=sharex,
+            plotID = self._view.subplotFromDataCapsules(xIcDataCapsules, plotType, decorator, sharex=sharex,
                                                             sharey=sharey)
         else:
-            self._view.addDatacapsuleToSubplot(xIcDataCapsule, plotID)
+            for xIcDataCapsule in xIcDataCapsules:
+                self._view.addDatacapsuleToSubplot(xIcDataCapsule, plotID)
         return plotID
 
     def plotIVs(self, fieldAxisSweepType, deviceID=0, overrideDecorator=None, plotID = None, insetID = None,
@@ -194,19 +225,17 @@ class Fieldsweep(Controller):
         return plotID
 
     def plotConstantBias(self, fieldAxisSweepType, ybias, deviceID=0, overrideDecorator=None, plotID = None,
-                         insetID = None, selection=None, sweepRange=None, sharex=None, sharey=None):
+                         insetID = None, selection=None, sweepRange=None, sharex=None, sharey=None, interpolate=False):
         plotIDs = []
 
-        dataCapsules = []
-
         if not isinstance(ybias, list) and not isinstance(ybias, np.ndarray):
             ybias = [ybias]
 
-        for yb in ybias:
-            dataCapsules.append(
-                self._dataModel.getConstantBias(fieldAxisSweepType, yb, deviceID=deviceID, selection=selection,
-                                                sweepRange=sweepRange))
-            dataCapsules[-1].label = Label(labelfloat=yb, labelfloatSILabel=SILabel(PlotUnits.BiasCurrent, PlotScales.Micro))
+        dataCapsules = self._dataModel.getConstantBiases(fieldAxisSweepType, ybias, deviceID=deviceID,
+                                                         selection=selection, sweepRange=sweepRange,
+                                                         interpolate=interpolate)
+        for yb, dataCapsule in zip(ybias, dataCapsules):
+            dataCapsule.label = Label(labelfloat=yb, labelfloatSILabel=SILabel(PlotUnits.BiasCurrent, PlotScales.Micro))
 
         if fieldAxisSweepType == SweepTypes.B_X:
             baseDecorator = Decorators.ConstantBias_MagneticField_x.value
@@ -278,5 +307,6 @@ class Fieldsweep(Controller):
             self._view.insetFromDataCapsules(dataCapsule, plotType, decorator, plotID, insetID)
         return plotID
 
-    def removeSeriesResistance(self, deviceID=0, Npoints=4):
-        self._dataModel.removeSeriesResistance(deviceID=deviceID, Npoints=Npoints)
\ No newline at end of file
+    def removeSeriesResistance(self, deviceID=0, Npoints=4, verbose=False):
+        # Returns the zero-bias resistance of every single measurement
+        return self._dataModel.removeSeriesResistance(deviceID=deviceID, Npoints=Npoints, verbose=verbose)
\ No newline at end of file
@@ -1,3 +1,5 @@
+import numpy as np
+
 class DataCapsule():
     label = None
 
@@ -15,17 +17,39 @@ class Label():
         self.labelfloatSILabel = labelfloatSILabel
 
 class RegularData3D(DataCapsule):
-    """Presents 3D data, regular in X and Y, on an (X,Y) grid."""
-    xx = None
-    yy = None
+    """Presents 3D data, regular in X and Y, on an (X,Y) grid. X and Y are either grids of the shape of Z, or 1D axes:
+    X along the columns of Z, Y along its rows (e.g. a current axis shared by all sweeps). Either way, xx and yy are
+    grids of the shape of Z; for axes they are read-only views that do not copy the axes."""
     zz = None
 
     def __init__(self, xx, yy, zz, label=None):
-        self.xx = xx
-        self.yy = yy
+        self._xx = np.asarray(xx)
+        self._yy = np.asarray(yy)
         self.zz = zz
         super().__init__(label=label)
 
+    @property
+    def x(self):
+        # The x value of every column
+        return self._xx if self._xx.ndim == 1 else self._xx[0, :]
+
+    @property
+    def y(self):
+        # The y axis shared by all columns, None if y differs between columns
+        return self._yy if self._yy.ndim == 1 else None
+
+    @property
+    def xx(self):
+        if self._xx.ndim == 1:
+            return np.broadcast_to(self._xx, np.shape(self.zz))
+        return self._xx
+
+    @property
+    def yy(self):
+        if self._yy.ndim == 1:
+            return np.broadcast_to(self._yy[:, np.newaxis], np.shape(self.zz))
+        return self._yy
+
 class IrregularData3D(DataCapsule):
     """Presents 3D data with irregular Y lengths as follows: X is an array, Y a list of arrays, Z the same shape as Y."""
     x = None
@@ -40,13 +64,15 @@ class IrregularData3D(DataCapsule):
 
 
 class Data2D(DataCapsule):
-    """Presents 2D data."""
+    """Presents 2D data, optionally with symmetric y-errors of the same shape as Y."""
     x = None
     y = None
+    yerr = None
 
-    def __init__(self, x, y, label=None):
+    def __init__(self, x, y, label=None, yerr=None):
         self.x = x
         self.y = y
+        self.yerr = yerr
         super().__init__(label=label)
 
 class SmoothFunction2D(DataCapsule):
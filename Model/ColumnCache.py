@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+class ColumnCache():
+    """Persistent on-disk cache of parsed measurement files.
+
+    Every source file gets one entry directory (named after the hash of its absolute path) holding the parsed columns
+    as a single .npy file, which is memory-mapped on load, and a meta.json with the column titles, the size, mtime
+    and content hash of the source file, and the formatVersion it was written with. An entry is valid as long as
+    size, mtime and formatVersion are unchanged; if only the mtime changed (e.g. a copy or touch), the content hash
+    decides. The total size of the cache is bounded by maxBytes, evicting the least recently used entries first."""
+    formatVersion = 1 # Increase when the parsing of measurement files changes, so that older entries are parsed again
+    _dataName = "data.npy"
+    _metaName = "meta.json"
+    _hashBlockSize = 1 << 20
+    _temporaryPrefix = ".tmp"
+    _abandonedAfterSeconds = 3600
+
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+
+    def load(self, path):
+        """Returns (titles, data) for path if a valid entry exists, None otherwise."""
+        entry = self._entryDirectory(path)
+        meta = self._readMeta(entry)
+        if meta is None:
+            return None
+        if meta.get("formatVersion") != self.formatVersion:
+            self.invalidate(path)
+            return None
+
+        stat = os.stat(path)
+        if meta["size"] != stat.st_size:
+            self.invalidate(path)
+            return None
+        if meta["mtime"] != stat.st_mtime_ns:
+            if meta["contentHash"] != self.contentHash(path):
+                self.invalidate(path)
+                return None
+            meta["mtime"] = stat.st_mtime_ns
+
+        try:
+            data = np.load(os.path.join(entry, self._dataName), mmap_mode='r')
+        except (OSError, ValueError):
+            self.invalidate(path)
+            return None
+
+        meta["lastUsed"] = time.time()
+        try:
+            self._writeMeta(entry, meta)
+        except OSError:
+            pass
+        return meta["titles"], data
+
+    def store(self, path, titles, data):
+        """Writes an entry for path and evicts old entries if the cache has grown beyond maxBytes. Tables larger than
+        maxBytes by themselves are not cached. The cache is only an optimization, so failing writes are ignored."""
+        if data.nbytes > self.maxBytes:
+            return
+
+        temporaryEntry = None
+        try:
+            stat = os.stat(path)
+            entry = self._entryDirectory(path)
+            meta = {"formatVersion": self.formatVersion,
+                    "path": os.path.abspath(path),
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "contentHash": self.contentHash(path),
+                    "titles": list(titles),
+                    "lastUsed": time.time()}
+
+            # Build the entry under a temporary name first, so that neither an interrupted store nor a concurrent
+            # eviction ever sees a partial entry:
+            os.makedirs(self.directory, exist_ok=True)
+            temporaryEntry = tempfile.mkdtemp(prefix=self._temporaryPrefix, dir=self.directory)
+            np.save(os.path.join(temporaryEntry, self._dataName), np.ascontiguousarray(data))
+            self._writeMeta(temporaryEntry, meta)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(temporaryEntry, entry)
+        except OSError:
+            if temporaryEntry is not None:
+                shutil.rmtree(temporaryEntry, ignore_errors=True)
+            return
+
+        self.evict(keep=entry)
+
+    def invalidate(self, path):
+        shutil.rmtree(self._entryDirectory(path), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in maxBytes."""
+        if not os.path.isdir(self.directory):
+            return
+
+        entries = []
+        totalBytes = 0
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith(self._temporaryPrefix):
+                # Entries being written by another process; only those left behind by a crash are removed:
+                try:
+                    if time.time() - os.path.getmtime(entry) > self._abandonedAfterSeconds:
+                        shutil.rmtree(entry, ignore_errors=True)
+                except OSError:
+                    pass
+                continue
+            meta = self._readMeta(entry)
+            if meta is None:
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            try:
+                nbytes = self._entryBytes(entry)
+            except OSError:
+                continue
+            totalBytes += nbytes
+            entries.append((meta["lastUsed"], entry, nbytes))
+
+        for _, entry, nbytes in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            totalBytes -= nbytes
+
+    def contentHash(self, path):
+        digest = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self._hashBlockSize), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entryDirectory(self, path):
+        name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def _entryBytes(self, entry):
+        return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+    def _readMeta(self, entry):
+        try:
+            with open(os.path.join(entry, self._metaName)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _writeMeta(self, entry, meta):
+        temporaryMeta = os.path.join(entry, "meta.tmp.json")
+        with open(temporaryMeta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temporaryMeta, os.path.join(entry, self._metaName))
@@ -0,0 +1,16 @@
+import numpy as np
+from typing import NamedTuple
+
+
+class ColumnTable(NamedTuple):
+    """All columns of a measurement file, parsed in a single pass. Data has shape (amount of columns, amount of rows),
+    so that every column is a contiguous array."""
+    titles: list
+    data: np.ndarray
+
+    def column(self, title):
+        return self.data[self.titles.index(title)]
+
+    def indicesWithIdentifier(self, identifier):
+        """Indices of all columns titled identifier(unit)..., one per device."""
+        return [i for i, title in enumerate(self.titles) if title[:len(identifier) + 1] == identifier + "("]
@@ -1,150 +1,105 @@
 from Model.Model import VectorMagnetModel
 from Model.TransportMeasurement import TransportMeasurement
+from Model.SegmentOperations import segmentLinearFit
 from Model.SingleMeasurement import SingleMeasurement
 from DataCapsule.DataCapsules import RegularData3D, IrregularData3D, Data2D
 from typing import NamedTuple
 import numpy as np
-from scipy.optimize import curve_fit
 
 class Keithley(VectorMagnetModel, TransportMeasurement):
-    def __init__(self, paths, invertVoltage=False):
+    quantities = ("current", "voltage")
+
+    def __init__(self, paths, invertVoltage=False, progressCallback=None, follow=False, useColumnCache=False,
+                 loadWorkers=1):
         self.invertVoltage = invertVoltage
 
-        super().__init__(paths)
-
-
-    def loadDataFromFile(self, path):
-        VTITemperature, sampleTemperature, Bx, By, Bz = self.vectorMagnetTemperatureAndField(path)
-        currentPerDevice, voltagePerDevice = self.loadCurrentAndVoltagePerDevice(path)
-        singleMeasurementFirstIndices = self.singleMeasurementFirstIndices([VTITemperature, sampleTemperature, Bx, By, Bz])
-
-        for i, start in enumerate(singleMeasurementFirstIndices):
-            if i < len(singleMeasurementFirstIndices) - 1:
-                end = singleMeasurementFirstIndices[i+1]
-            else:
-                end = len(VTITemperature)
-
-            ivPerDevice = []
-            for deviceID in range(len(currentPerDevice)):
-                curr, vol = currentPerDevice[deviceID][start:end], voltagePerDevice[deviceID][start:end]
-                if self.invertVoltage:
-                    vol *= -1
-                iv = KeithleyIV(current = curr,
-                                voltage = vol)
-                ivPerDevice.append(iv)
-            self._data.append(KeithleyData(VTITemperature[start],
-                                      sampleTemperature[start],
-                                      Bx[start],
-                                      By[start],
-                                      Bz[start],
-                                      ivPerDevice))
-
-    def loadCurrentAndVoltagePerDevice(self, path):
-        return self.load2DDataForVectorMagnet(path, "I", "V")
+        super().__init__(paths, progressCallback=progressCallback, follow=follow, useColumnCache=useColumnCache,
+                         loadWorkers=loadWorkers)
 
-    def isRegular(self, deviceID=0):
-        isRegular = True
 
-        # Check if all I-axes are equally long, so that the data can be put into a grid:
-        for data in self._data:
-            if len(data.IVPerDevice[deviceID].current) != len(self._data[0].IVPerDevice[deviceID].current):
-                isRegular = False
-                break
+    def loadDataFromTable(self, table):
+        environment = self.vectorMagnetTemperatureAndField(table)
+        currentPerDevice, voltagePerDevice = self.loadCurrentAndVoltagePerDevice(table)
+        if self.invertVoltage:
+            voltagePerDevice = [-voltage for voltage in voltagePerDevice]
 
-        return isRegular
+        self._data.append(self.singleMeasurementFirstIndices(environment), environment,
+                          {"current": currentPerDevice, "voltage": voltagePerDevice})
 
-    def sweepResistance(self, sweepType, deviceID=0):
-        """Returns (x,R) data for some environmental x."""
-        x = np.zeros(len(self._data))
-        y = np.zeros_like(x)
+    def singleMeasurement(self, index):
+        ivPerDevice = []
+        for deviceID in range(self._data.amountOfDevices):
+            ivPerDevice.append(KeithleyIV(current=self._data.segment("current", deviceID, index),
+                                          voltage=self._data.segment("voltage", deviceID, index)))
+        return KeithleyData(*self._data.environmentOf(index), ivPerDevice)
+
+    def loadCurrentAndVoltagePerDevice(self, table):
+        return self.load2DDataForVectorMagnet(table, "I", "V")
 
-        for i in range(len(x)):
-            x[i] = self._data[i].environmental(sweepType)
-            y[i] = self._data[i].resistance(deviceID=deviceID)
+    def isRegular(self, deviceID=0):
+        # All devices share the rows of a file, so the I-axes are equally long for every device:
+        return self._data.isRegular()
+
+    def sweepResistance(self, sweepType, deviceID=0):
+        """Returns (x,R) data for some environmental x, with the standard error of R as y-error."""
+        fit = segmentLinearFit(self._data.column("current", deviceID), self._data.column("voltage", deviceID),
+                               self._data.offsets)
 
-        return Data2D(x,y)
+        return Data2D(self._data.environmental(sweepType).copy(), fit.slope, yerr=fit.slopeError)
 
     def sweepIV(self, sweepType, deviceID=0):
         """Returns (x,I,V) data for some environmental variable x."""
-        if self.isRegular(deviceID=0):
-            xx = np.zeros((len(self._data[0].IVPerDevice[deviceID].current), len(self._data)))
-            II = np.zeros_like(xx)
-            VV = np.zeros_like(II)
+        x = self._data.environmental(sweepType)
 
-            for i, data in enumerate(self._data):
-                xx[:, i] = data.environmental(sweepType)
-                II[:, i] = data.IVPerDevice[deviceID].current
-                VV[:, i] =  data.IVPerDevice[deviceID].voltage
+        if self.isRegular(deviceID=deviceID):
+            II = self._data.grid("current", deviceID)
+            VV = self._data.grid("voltage", deviceID)
 
-            capsule = RegularData3D(xx, II, VV)
+            capsule = RegularData3D(x.copy(), self._currentAxis(II), VV)
 
         else:
-            x = np.zeros(len(self._data))
-            I = []
-            V = []
-
-            for i, data in enumerate(self._data):
-                x[i] = data.environmental(sweepType)
-                I.append(data.IVPerDevice[deviceID].current)
-                V.append(data.IVPerDevice[deviceID].voltage)
-
-            capsule = IrregularData3D(x, I, V)
+            capsule = IrregularData3D(x.copy(), self._data.segments("current", deviceID),
+                                      self._data.segments("voltage", deviceID))
 
         return capsule
 
     def sweepIdVdI(self, sweepType, deviceID=0):
         """Returns (x,I,V) data for some environmental variable x."""
-        if self.isRegular(deviceID=0):
-            xx = np.zeros((len(self._data[0].IVPerDevice[deviceID].current), len(self._data)))
-            II = np.zeros_like(xx)
-            dVdIGrid = np.zeros_like(xx)
+        x = self._data.environmental(sweepType)
 
-            for i, data in enumerate(self._data):
-                xx[:, i] = data.environmental(sweepType)
-                II[:, i] = data.IVPerDevice[deviceID].current
-                dVdIGrid[:, i] = self.derivative(II[:,i], data.IVPerDevice[deviceID].voltage)
+        if self.isRegular(deviceID=deviceID):
+            II = self._data.grid("current", deviceID)
+            dVdIGrid = self.derivative(II, self._data.grid("voltage", deviceID))
 
-            capsule = RegularData3D(xx, II, dVdIGrid)
+            capsule = RegularData3D(x.copy(), self._currentAxis(II), dVdIGrid)
 
         else:
-            x = np.zeros(len(self._data))
-            I = []
-            dVdI = []
+            I = self._data.segments("current", deviceID)
+            V = self._data.segments("voltage", deviceID)
+            dVdI = [self.derivative(current, voltage) for current, voltage in zip(I, V)]
 
-            for i, data in enumerate(self._data):
-                x[i] = data.environmental(sweepType)
-                I.append(data.IVPerDevice[deviceID].current)
-                dVdI.append(self.derivative(data.IVPerDevice[deviceID].current, data.IVPerDevice[deviceID].voltage))
-
-            capsule = IrregularData3D(x, I, dVdI)
+            capsule = IrregularData3D(x.copy(), I, dVdI)
 
         return capsule
 
-    def removeSeriesResistance(self, deviceID=0, Npoints=4):
-        smallestResistance = np.inf
-
-        for ivdata in self._data:
-            current = ivdata.IVPerDevice[deviceID].current
-            voltage = ivdata.IVPerDevice[deviceID].voltage
+    def _currentAxis(self, II):
+        # The current axis if all sweeps share one, else the full grid
+        if II.shape[1] > 0 and np.array_equal(II, np.broadcast_to(II[:, :1], II.shape)):
+            return II[:, 0].copy()
+        return II
 
-            centerindex = np.argmin(np.abs(current))
-            if centerindex == 0:
-                centerindex = 1
+    def zeroBiasResistances(self, deviceID=0, Npoints=4):
+        """Slope of a straight line through the points around zero current of every single measurement, fitted in
+        closed form for all windows at once."""
+        indices, valid = self._zeroBiasWindows(deviceID, Npoints)
+        current = self._data.column("current", deviceID)[indices]
+        voltage = self._data.column("voltage", deviceID)[indices]
 
-            dvdi = (voltage[centerindex+Npoints] - voltage[centerindex-Npoints]) / (current[centerindex+Npoints] - current[centerindex-Npoints])
-            param, _ = curve_fit(lambda x,a,b: a*x+b, current[centerindex-Npoints:centerindex+Npoints+1], voltage[centerindex-Npoints:centerindex+Npoints+1], p0=[dvdi, 0.0])
-            if param[0] < smallestResistance:
-                smallestResistance = param[0]
-
-        if smallestResistance > 0:
-            print("Subtracting residual resistance of", round(smallestResistance*1e3), "mOhms")
-
-            for i, ivdata in enumerate(self._data):
-                newIV = KeithleyIV(current=ivdata.IVPerDevice[deviceID].current,
-                                   voltage=ivdata.IVPerDevice[deviceID].voltage - ivdata.IVPerDevice[deviceID].current*smallestResistance)
-                self._data[i].IVPerDevice[deviceID] = newIV
-        else:
-            print("Smallest resistance was non-positive, not modifying dataset.")
+        amount = valid.sum(axis=1)
+        dI = np.where(valid, current - (np.where(valid, current, 0).sum(axis=1) / amount)[:, np.newaxis], 0)
+        dV = np.where(valid, voltage - (np.where(valid, voltage, 0).sum(axis=1) / amount)[:, np.newaxis], 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (dI * dV).sum(axis=1) / (dI * dI).sum(axis=1)
 
 
 
@@ -162,8 +117,7 @@ class KeithleyData(SingleMeasurement):
 
     def resistance(self, deviceID=0):
         iv = self.IVPerDevice[deviceID]
-        params, _ = curve_fit(lambda x, a, b: a*x+b, iv.current, iv.voltage, p0=[iv.voltage[0]/iv.current[0], 0.0])
-        return params[0]
+        return segmentLinearFit(iv.current, iv.voltage, [0, len(iv.current)]).slope[0]
 
 class KeithleyIV(NamedTuple):
     current: np.ndarray
@@ -0,0 +1,174 @@
+import numpy as np
+
+from Model.SingleMeasurement import SweepTypes
+
+
+class MeasurementStore():
+    """Columnar storage of consecutive single measurements.
+
+    Every quantity (current, voltage, ...) is kept as one contiguous array per device, holding all single measurements
+    back-to-back. The offsets (CSR style) mark where each single measurement starts: single measurement i spans rows
+    offsets[i]:offsets[i+1]. The environment (temperatures and fields) is stored once per single measurement.
+    SingleMeasurement objects are only built when indexing the store, as views into the columns.
+
+    The stored arrays are read-only, since views of them are handed out in data capsules. Corrections to a quantity
+    are made by replacing its column with setColumn."""
+    _environmentNames = {SweepTypes.T_VTI: "VTITemperature",
+                         SweepTypes.T_SAMPLE: "sampleTemperature",
+                         SweepTypes.B_X: "Bx",
+                         SweepTypes.B_Y: "By",
+                         SweepTypes.B_Z: "Bz"}
+
+    def __init__(self, quantities, measurementFactory):
+        """Quantities: names of the per-row quantities. MeasurementFactory: callable mapping an index to a
+        SingleMeasurement, used when the store is indexed or iterated."""
+        self.quantities = tuple(quantities)
+        self._measurementFactory = measurementFactory
+        self.version = 0 # Increases on every change of the stored data
+
+        self._pending = [] # Appended chunks that are not yet merged into the contiguous arrays
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._environment = {name: np.zeros(0) for name in self._environmentNames.values()}
+        self._columns = {quantity: [] for quantity in self.quantities} # One array per device
+
+    def append(self, firstIndices, environment, columnsPerDevice):
+        """Appends the rows of one file or chunk.
+        FirstIndices: row indices at which a new single measurement starts.
+        Environment: VTI temperature, sample temperature, Bx, By and Bz, one value per row.
+        ColumnsPerDevice: dictionary mapping every quantity to a list of per-device arrays, one value per row."""
+        firstIndices = np.asarray(firstIndices, dtype=np.int64)
+        if len(firstIndices) == 0:
+            # No single measurement yet (e.g. a followed file that is still being written), but the devices are known:
+            self._merge()
+            for quantity in self.quantities:
+                if not self._columns[quantity]:
+                    self._columns[quantity] = [self._emptyColumn() for _ in columnsPerDevice[quantity]]
+            return
+
+        amountOfRows = len(environment[0])
+        environmentPerMeasurement = [np.asarray(values, dtype=float)[firstIndices] for values in environment]
+        columns = {quantity: [np.asarray(values, dtype=float) for values in columnsPerDevice[quantity]]
+                   for quantity in self.quantities}
+        lengths = np.diff(np.append(firstIndices, amountOfRows))
+
+        self._pending.append((environmentPerMeasurement, columns, lengths))
+        self.modified()
+
+    def modified(self):
+        """To be called after changing stored data in place, so that results derived from it are recomputed."""
+        self.version += 1
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Single measurement index out of range.")
+        return self._measurementFactory(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._measurementFactory(index)
+
+    @property
+    def offsets(self):
+        self._merge()
+        return self._offsets
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def amountOfDevices(self):
+        self._merge()
+        return len(self._columns[self.quantities[0]])
+
+    def isRegular(self):
+        """True if all single measurements have the same amount of rows, so that they fit into a grid."""
+        lengths = self.lengths
+        return len(lengths) > 0 and bool(np.all(lengths == lengths[0]))
+
+    def environmental(self, sweepType):
+        """Returns the environmental variable of every single measurement as an array."""
+        if sweepType not in self._environmentNames:
+            raise TypeError("Unknown axis type.")
+        self._merge()
+        return self._environment[self._environmentNames[sweepType]]
+
+    def environmentOf(self, index):
+        """Returns VTI temperature, sample temperature, Bx, By and Bz of a single measurement."""
+        self._merge()
+        return [self._environment[name][index] for name in self._environmentNames.values()]
+
+    def column(self, quantity, deviceID=0):
+        """Returns the contiguous, read-only array holding a quantity for all single measurements. Empty if there are
+        none yet, also before the amount of devices is known."""
+        self._merge()
+        if len(self) == 0 and deviceID >= len(self._columns[quantity]):
+            return self._emptyColumn()
+        return self._columns[quantity][deviceID]
+
+    def _emptyColumn(self):
+        column = np.zeros(0)
+        column.flags.writeable = False
+        return column
+
+    def setColumn(self, quantity, deviceID, values):
+        """Replaces a quantity for all single measurements. Views handed out earlier keep the old values."""
+        self._merge()
+        values = np.array(values, dtype=float)
+        if values.shape != self._columns[quantity][deviceID].shape:
+            raise ValueError("Replacement column has the wrong shape.")
+        values.flags.writeable = False
+        self._columns[quantity][deviceID] = values
+        self.modified()
+
+    def segment(self, quantity, deviceID, index):
+        offsets = self.offsets
+        return self.column(quantity, deviceID)[offsets[index]:offsets[index + 1]]
+
+    def segments(self, quantity, deviceID=0):
+        """Returns the quantity per single measurement, as a list of views."""
+        if len(self) == 0:
+            return []
+        return np.split(self.column(quantity, deviceID), self.offsets[1:-1])
+
+    def grid(self, quantity, deviceID=0):
+        """For regular data, returns the quantity as a (rows, single measurements) grid. This is a view, not a copy."""
+        if not self.isRegular():
+            raise ValueError("Single measurements differ in length and cannot be put into a grid.")
+        return self.column(quantity, deviceID).reshape(len(self), -1).T
+
+    def _merge(self):
+        if not self._pending:
+            return
+
+        chunks = self._pending
+        self._pending = []
+
+        lengths = np.concatenate([np.diff(self._offsets)] + [lengths for _, _, lengths in chunks])
+        self._offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        for i, name in enumerate(self._environmentNames.values()):
+            self._environment[name] = np.concatenate([self._environment[name]] +
+                                                     [environment[i] for environment, _, _ in chunks])
+
+        for quantity in self.quantities:
+            amountsOfDevices = {len(columns[quantity]) for _, columns, _ in chunks}
+            if self._columns[quantity]:
+                amountsOfDevices.add(len(self._columns[quantity]))
+            if len(amountsOfDevices) > 1:
+                raise ValueError("Files contain different amounts of devices.")
+
+            merged = []
+            for deviceID in range(amountsOfDevices.pop()):
+                parts = [columns[quantity][deviceID] for _, columns, _ in chunks]
+                if self._columns[quantity]:
+                    parts.insert(0, self._columns[quantity][deviceID])
+                values = np.concatenate(parts)
+                values.flags.writeable = False
+                merged.append(values)
+            self._columns[quantity] = merged
@@ -1,26 +1,65 @@
 import numpy as np
+import os
 import warnings
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from scipy.signal import savgol_filter
+
+from Model.ColumnCache import ColumnCache
+from Model.ColumnTable import ColumnTable
+from Model.MeasurementStore import MeasurementStore
+from Model.SegmentReader import SegmentReader
 
 class Model(ABC):
-    def __init__(self, paths):
-        self._data = []
+    segmentTolerance = None # Scalar or per-environment-column tolerance used to split data into single measurements
+    derivativeSmoothWindow = None # Savitzky-Golay window length applied before differentiating, None to disable
+    derivativeSmoothOrder = 2
+
+    def __init__(self, paths, progressCallback=None, follow=False, loadWorkers=1):
+        """ProgressCallback: optional callable, called as progressCallback(filesLoaded, amountOfFiles, path) after
+        every loaded file. Follow: the files are still being written; rows appended later are loaded by refresh().
+        LoadWorkers: amount of processes parsing files in parallel, where supported; 1 loads files one by one."""
+        self._data = self.emptyData()
+        self.follow = follow
+        self.loadWorkers = loadWorkers
+        self._followedReaders = []
         if isinstance(paths, list):
             for path in paths:
-                if isinstance(path, str):
-                    self.loadDataFromFile(path)
-                else:
+                if not isinstance(path, str):
                     raise TypeError("Paths contains a non-string element.")
         elif isinstance(paths, str):
-            self.loadDataFromFile(paths)
+            paths = [paths]
         else:
             raise TypeError("Paths is not a list of strings, or a string.")
 
+        self.loadDataFromFiles(paths, progressCallback=progressCallback)
+
+    def loadDataFromFiles(self, paths, progressCallback=None):
+        # Loads data from several files, in order
+        for i, path in enumerate(paths):
+            if self.follow:
+                self.followFile(path)
+            else:
+                self.loadDataFromFile(path)
+            if progressCallback is not None:
+                progressCallback(i + 1, len(paths), path)
+
     @abstractmethod
     def loadDataFromFile(self, path):
         # Loads data from a single file
         pass
 
+    def followFile(self, path):
+        # Loads the data written to a file so far, and keeps track of it for refresh()
+        raise NotImplementedError("This model cannot follow files that are being written.")
+
+    def refresh(self, final=False):
+        # Loads data appended to followed files, returns the amount of new single measurements
+        return 0
+
+    def emptyData(self):
+        return []
+
     def columnTitles(self, path):
         with open(path) as f:
             header = f.readline().rstrip()
@@ -29,100 +68,263 @@ class Model(ABC):
 
         return columnTitles
 
-    def singleMeasurementFirstIndices(self, listOfArrays):
-        singleMeasurementFirstIndices = [0]
+    def singleMeasurementFirstIndices(self, listOfArrays, tolerance=None):
+        """Returns the indices at which a new single measurement starts, i.e. where any of the arrays changes value.
+        With a tolerance (a scalar, or one value per array), only steps larger than the tolerance count as a change,
+        so that setpoint jitter does not split one measurement into many. Defaults to the segmentTolerance member."""
+        tolerance = tolerance if tolerance is not None else self.segmentTolerance
+        stacked = np.vstack(listOfArrays)
+        if stacked.shape[1] == 0:
+            return np.zeros(0, dtype=np.int64)
 
-        for i in range(1, len(listOfArrays[0])):
-            for array in listOfArrays:
-                if array[i] != array[i-1]:
-                    singleMeasurementFirstIndices.append(i)
-                    break
+        if tolerance is None:
+            changed = stacked[:, 1:] != stacked[:, :-1]
+        else:
+            tolerance = np.broadcast_to(np.asarray(tolerance, dtype=float).reshape(-1, 1), (stacked.shape[0], 1))
+            changed = ~(np.abs(np.diff(stacked, axis=1)) <= tolerance) # NaNs count as a change, like != does
+
+        return np.concatenate(([0], np.flatnonzero(changed.any(axis=0)) + 1))
 
-        return singleMeasurementFirstIndices
+    def derivative(self, x, y, smoothWindow=None, smoothOrder=None):
+        """Returns dy/dx along the first axis, so a whole grid with one curve per column is differentiated in a single
+        call. Uses second-order accurate finite differences that allow non-uniform spacing, also at the edges. If a
+        smoothWindow is given (defaults to the derivativeSmoothWindow member), y is Savitzky-Golay smoothed first."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        smoothWindow = smoothWindow if smoothWindow is not None else self.derivativeSmoothWindow
+        smoothOrder = smoothOrder if smoothOrder is not None else self.derivativeSmoothOrder
+
+        if smoothWindow is not None and len(y) >= smoothWindow:
+            y = savgol_filter(y, smoothWindow, smoothOrder, axis=0)
 
-    def derivative(self, x, y):
         dydx = np.zeros_like(y)
+        if len(x) < 2:
+            return dydx
+
+        h = np.diff(x, axis=0)
+        if y.ndim > x.ndim:
+            # One x axis shared by all columns of y:
+            h = h.reshape(h.shape + (1,) * (y.ndim - x.ndim))
+        h = np.broadcast_to(h, (len(x) - 1,) + y.shape[1:])
+        if len(x) == 2:
+            dydx[0] = dydx[1] = divideOrNaN(y[1] - y[0], h[0])
+            return dydx
 
-        for i in range(1,len(x)-1):
-            dydx[i] = (y[i+1]-y[i-1])/(x[i+1]-x[i-1])
-        dydx[0]  = (-1.5*y[0]  + 2*y[1]  - .5*y[2])/(x[i+1]-x[i])
-        dydx[-1] = ( 1.5*y[-1] - 2*y[-2] +.5*y[-3])/(x[-1]-x[-2])
+        # Repeated x values (e.g. at the turning points of up/down sweeps) make the second-order stencils divide by
+        # zero; there the old central difference is used, or a one-sided difference on the side where x changes.
+        h1 = h[:-1]
+        h2 = h[1:]
+        stencil = (divideOrNaN(-h2 * y[:-2], h1 * (h1 + h2))
+                   + divideOrNaN((h2 - h1) * y[1:-1], h1 * h2)
+                   + divideOrNaN(h1 * y[2:], h2 * (h1 + h2)))
+        fallback = np.where(h1 + h2 != 0, divideOrNaN(y[2:] - y[:-2], h1 + h2),
+                            np.where(h2 != 0, divideOrNaN(y[2:] - y[1:-1], h2), divideOrNaN(y[1:-1] - y[:-2], h1)))
+        dydx[1:-1] = np.where((h1 != 0) & (h2 != 0) & (h1 + h2 != 0), stencil, fallback)
+
+        h1, h2 = h[0], h[1]
+        stencil = (divideOrNaN(-(2 * h1 + h2) * y[0], h1 * (h1 + h2))
+                   + divideOrNaN((h1 + h2) * y[1], h1 * h2)
+                   - divideOrNaN(h1 * y[2], h2 * (h1 + h2)))
+        fallback = np.where(h1 != 0, divideOrNaN(y[1] - y[0], h1), divideOrNaN(y[2] - y[0], h1 + h2))
+        dydx[0] = np.where((h1 != 0) & (h2 != 0) & (h1 + h2 != 0), stencil, fallback)
+
+        h1, h2 = h[-2], h[-1]
+        stencil = (divideOrNaN(h2 * y[-3], h1 * (h1 + h2))
+                   - divideOrNaN((h1 + h2) * y[-2], h1 * h2)
+                   + divideOrNaN((2 * h2 + h1) * y[-1], h2 * (h1 + h2)))
+        fallback = np.where(h2 != 0, divideOrNaN(y[-1] - y[-2], h2), divideOrNaN(y[-1] - y[-3], h1 + h2))
+        dydx[-1] = np.where((h1 != 0) & (h2 != 0) & (h1 + h2 != 0), stencil, fallback)
 
         return dydx
 
 
 class VectorMagnetModel(Model):
-    def genColumnsFromTxtForVectorMagnet(self, path, columnList):
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", message="ConversionWarning: Some errors were detected !")
-            returnValues = np.genfromtxt(path, skip_header=1, usecols=columnList, invalid_raise=False, unpack=False)
-        return returnValues.T
-
-    def vectorMagnetTemperatureAndField(self, path):
-        columnTitles = self.columnTitles(path)
-
-        VTITemperatureIndex = columnTitles.index("T(K)[VTI]")
-        sampleTemperatureIndex = columnTitles.index("T(K)[Sample]")
-        BxIndex = columnTitles.index("Bx(T)")
-        ByIndex = columnTitles.index("By(T)")
-        BzIndex = columnTitles.index("Bz(T)")
-
-        VTITemperature, sampleTemperature, Bx, By, Bz = self.genColumnsFromTxtForVectorMagnet(path, [VTITemperatureIndex,
-                                                                                                     sampleTemperatureIndex,
-                                                                                                     BxIndex,
-                                                                                                     ByIndex,
-                                                                                                     BzIndex])
-        return VTITemperature, sampleTemperature, Bx, By, Bz
+    columnCacheDirectory = os.path.join(os.path.expanduser("~"), ".cache", "MyPlotting")
+    columnCacheMaxBytes = 4 * 1024**3
+    streamThresholdBytes = 512 * 1024**2 # Files larger than this are parsed in chunks and bypass the column cache
+    streamChunkBytes = 64 * 1024**2
 
-    def load2DDataForVectorMagnet(self, path, xIdentifier, yIdentifier):
-        columnTitles = self.columnTitles(path)
+    quantities = () # Names of the per-row quantities stored for every device
 
-        # The Keithley data sets come with I, V data that we want for every device:
-        xIndices = []
-        yIndices = []
+    def __init__(self, paths, progressCallback=None, follow=False, useColumnCache=False, loadWorkers=1):
+        """UseColumnCache: keep the parsed files as memory-mapped tables in columnCacheDirectory (by default
+        ~/.cache/MyPlotting, at most columnCacheMaxBytes), so that loading them again skips parsing the text."""
+        self.useColumnCache = useColumnCache
+        super().__init__(paths, progressCallback=progressCallback, follow=follow, loadWorkers=loadWorkers)
+
+    def emptyData(self):
+        return MeasurementStore(self.quantities, self.singleMeasurement)
+
+    @abstractmethod
+    def singleMeasurement(self, index):
+        # Builds the SingleMeasurement at an index of the store, as views into its columns
+        pass
+
+    def loadDataFromFile(self, path):
+        if os.path.getsize(path) > self.streamThresholdBytes:
+            for _ in self.streamDataFromFile(path):
+                pass
+        else:
+            self.loadDataFromTable(self.columnTable(path))
+
+    def streamDataFromFile(self, path):
+        """Loads a file chunk by chunk, so that only one chunk of text is parsed in memory at a time. A generator that
+        yields the amount of single measurements loaded so far after every chunk, so the data can already be swept
+        before the whole file is read."""
+        for table in self.segmentReader(path).readAvailable(final=True):
+            self.loadDataFromTable(table)
+            yield len(self._data)
+
+    def followFile(self, path):
+        """Loads the single measurements completed so far in a file that is still being written. The reader remembers
+        the byte offset and the rows of the last, possibly unfinished, single measurement, so that refresh() only
+        parses the rows appended since. Followed files bypass the column cache."""
+        reader = self.segmentReader(path)
+        self._followedReaders.append(reader)
+        for table in reader.readAvailable():
+            self.loadDataFromTable(table)
+
+        if reader.titles is not None and len(self._data) == 0:
+            # No single measurement is complete yet; an empty table still tells the amount of devices:
+            self.loadDataFromTable(ColumnTable(titles=reader.titles, data=np.zeros((len(reader.titles), 0))))
+
+    def refresh(self, final=False):
+        """Loads the single measurements completed since the last refresh in all followed files, at a cost that scales
+        with the appended data rather than the file size. Returns the amount of new single measurements. With final
+        (the measurement has finished), the last single measurement of every file is loaded too and the files are no
+        longer followed."""
+        amountBefore = len(self._data)
+        for reader in self._followedReaders:
+            for table in reader.readAvailable(final=final):
+                self.loadDataFromTable(table)
+        if final:
+            self._followedReaders = []
+        return len(self._data) - amountBefore
 
-        for i, title in enumerate(columnTitles):
-            if title[:len(xIdentifier)+1] == xIdentifier + "(":
-                xIndices.append(i)
-            if title[:len(yIdentifier)+1] == yIdentifier + "(":
-                yIndices.append(i)
+    def segmentReader(self, path):
+        return SegmentReader(path, lambda table: self.singleMeasurementFirstIndices(self.vectorMagnetTemperatureAndField(table)),
+                             self.streamChunkBytes)
+
+    def loadDataFromFiles(self, paths, progressCallback=None):
+        """With loadWorkers > 1, files that are not in the cache are parsed in a process pool (the text parsers hold
+        the GIL), except for files above streamThresholdBytes, which are streamed. The tables are merged into the data
+        in the order of paths, regardless of which finishes first."""
+        if self.loadWorkers <= 1 or len(paths) <= 1 or self.follow:
+            super().loadDataFromFiles(paths, progressCallback=progressCallback)
+            return
+
+        cacheDirectory = self.columnCacheDirectory if self.useColumnCache else None
+        tables = [readCachedColumnTable(path, cacheDirectory, self.columnCacheMaxBytes) if cacheDirectory else None
+                  for path in paths]
+
+        with ProcessPoolExecutor(max_workers=self.loadWorkers) as executor:
+            futures = [executor.submit(readColumnTable, path, cacheDirectory, self.columnCacheMaxBytes)
+                       if table is None and os.path.getsize(path) <= self.streamThresholdBytes else None
+                       for path, table in zip(paths, tables)]
+
+            for i, path in enumerate(paths):
+                table = tables[i] if futures[i] is None else futures[i].result()
+                tables[i] = None # Release the table once it is merged
+                if table is None:
+                    self.loadDataFromFile(path) # Too large to parse at once; streamed here
+                else:
+                    self.loadDataFromTable(table)
+                if progressCallback is not None:
+                    progressCallback(i + 1, len(paths), path)
+
+    @abstractmethod
+    def loadDataFromTable(self, table):
+        # Loads data from the ColumnTable of a single file
+        pass
+
+    def columnTable(self, path):
+        """Returns the ColumnTable of a file, from the on-disk cache if it holds a valid entry for it."""
+        cacheDirectory = self.columnCacheDirectory if self.useColumnCache else None
+        return readColumnTable(path, cacheDirectory, self.columnCacheMaxBytes)
+
+    def columnTableFromTxt(self, path):
+        return columnTableFromTxt(path)
+
+    def vectorMagnetTemperatureAndField(self, table):
+        VTITemperature = table.column("T(K)[VTI]")
+        sampleTemperature = table.column("T(K)[Sample]")
+        Bx = table.column("Bx(T)")
+        By = table.column("By(T)")
+        Bz = table.column("Bz(T)")
+
+        return VTITemperature, sampleTemperature, Bx, By, Bz
+
+    def load2DDataForVectorMagnet(self, table, xIdentifier, yIdentifier):
+        # The Keithley data sets come with I, V data that we want for every device:
+        xIndices = table.indicesWithIdentifier(xIdentifier)
+        yIndices = table.indicesWithIdentifier(yIdentifier)
 
         xPerDevice = []
         yPerDevice = []
-        for i, xIndex in enumerate(xIndices):
-            yIndex = yIndices[i]
-
-            x, y = self.genColumnsFromTxtForVectorMagnet(path, [xIndex, yIndex])
-            xPerDevice.append(x)
-            yPerDevice.append(y)
+        for xIndex, yIndex in zip(xIndices, yIndices):
+            xPerDevice.append(table.data[xIndex])
+            yPerDevice.append(table.data[yIndex])
 
         return xPerDevice, yPerDevice
 
-    def load3DDataForVectorMagnet(self, path, xIdentifier, yIdentifier, zIdentifier):
-        columnTitles = self.columnTitles(path)
-
+    def load3DDataForVectorMagnet(self, table, xIdentifier, yIdentifier, zIdentifier):
         # The Keithley data sets come with I, V data that we want for every device:
-        xIndices = []
-        yIndices = []
-        zIndices = []
-
-        for i, title in enumerate(columnTitles):
-            if title[:len(xIdentifier) + 1] == xIdentifier + "(":
-                xIndices.append(i)
-            if title[:len(yIdentifier) + 1] == yIdentifier + "(":
-                yIndices.append(i)
-            if title[:len(zIdentifier) + 1] == zIdentifier + "(":
-                zIndices.append(i)
+        xIndices = table.indicesWithIdentifier(xIdentifier)
+        yIndices = table.indicesWithIdentifier(yIdentifier)
+        zIndices = table.indicesWithIdentifier(zIdentifier)
 
         xPerDevice = []
         yPerDevice = []
         zPerDevice = []
 
         for xIndex, yIndex, zIndex in zip(xIndices, yIndices, zIndices):
-            x, y, z = self.genColumnsFromTxtForVectorMagnet(path, [xIndex, yIndex, zIndex])
-            xPerDevice.append(x)
-            yPerDevice.append(y)
-            zPerDevice.append(z)
+            xPerDevice.append(table.data[xIndex])
+            yPerDevice.append(table.data[yIndex])
+            zPerDevice.append(table.data[zIndex])
 
         return xPerDevice, yPerDevice, zPerDevice
 
+
+def divideOrNaN(numerator, denominator):
+    """Elementwise numerator / denominator, NaN where the denominator is zero, without a division warning."""
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float),
+                                                 np.asarray(denominator, dtype=float))
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator != 0)
+
+
+def readCachedColumnTable(path, cacheDirectory, cacheMaxBytes):
+    """Returns the ColumnTable of a file from the on-disk cache, None if the cache holds no valid entry for it."""
+    cached = ColumnCache(cacheDirectory, cacheMaxBytes).load(path)
+    if cached is None:
+        return None
+    titles, data = cached
+    return ColumnTable(titles=titles, data=data)
+
+
+def readColumnTable(path, cacheDirectory=None, cacheMaxBytes=0):
+    """Returns the ColumnTable of a file, using the on-disk cache in cacheDirectory unless it is None. A module-level
+    function, so that it can be run in worker processes."""
+    if cacheDirectory is None:
+        return columnTableFromTxt(path)
+
+    table = readCachedColumnTable(path, cacheDirectory, cacheMaxBytes)
+    if table is None:
+        table = columnTableFromTxt(path)
+        ColumnCache(cacheDirectory, cacheMaxBytes).store(path, table.titles, table.data)
+    return table
+
+
+def columnTableFromTxt(path):
+    """Tokenizes the file once. The fast C parser of np.loadtxt is tried first; files with malformed rows fall back
+    to np.genfromtxt, which skips them."""
+    with open(path) as f:
+        columnTitles = f.readline().rstrip().split()
+
+    try:
+        data = np.loadtxt(path, skiprows=1, ndmin=2)
+    except ValueError:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="ConversionWarning: Some errors were detected !")
+            data = np.genfromtxt(path, skip_header=1, invalid_raise=False, ndmin=2)
+
+    return ColumnTable(titles=columnTitles, data=np.ascontiguousarray(data.T))
@@ -0,0 +1,327 @@
+import numpy as np
+from typing import NamedTuple
+
+# Vectorized operations on segmented (CSR style) data: many variable-length segments stored back-to-back in one
+# contiguous array, with offsets of length (amount of segments + 1) such that segment i spans
+# values[offsets[i]:offsets[i+1]]. All segments are assumed to be non-empty.
+
+
+def segmentLengths(offsets):
+    return np.diff(offsets)
+
+
+def segmentIDs(offsets):
+    """Returns for every element the index of the segment it belongs to."""
+    return np.repeat(np.arange(len(offsets) - 1), segmentLengths(offsets))
+
+
+def segmentFirstTrue(condition, offsets):
+    """Returns the global index of the first True element of every segment, -1 for segments without one."""
+    first = np.full(len(offsets) - 1, -1, dtype=np.int64)
+    candidates = np.flatnonzero(condition)
+    segments, firstCandidate = np.unique(segmentIDs(offsets)[candidates], return_index=True)
+    first[segments] = candidates[firstCandidate]
+    return first
+
+
+def segmentLastTrue(condition, offsets):
+    """Returns the global index of the last True element of every segment, -1 for segments without one."""
+    last = np.full(len(offsets) - 1, -1, dtype=np.int64)
+    candidates = np.flatnonzero(condition)[::-1]
+    segments, lastCandidate = np.unique(segmentIDs(offsets)[candidates], return_index=True)
+    last[segments] = candidates[lastCandidate]
+    return last
+
+
+def segmentArgmin(values, offsets):
+    """Returns the global index of the first minimum of every segment, ignoring NaNs. Segments with only NaNs give the
+    index of their first element."""
+    minima = np.fmin.reduceat(values, offsets[:-1])
+    argmin = segmentFirstTrue(values == np.repeat(minima, segmentLengths(offsets)), offsets)
+    return np.where(argmin < 0, offsets[:-1], argmin)
+
+
+def segmentThresholdCrossing(y, z, offsets, zThreshold, polarity=1, interpolate=False):
+    """Returns per segment the y at which z crosses zThreshold, e.g. the critical current of every IV curve.
+
+    Polarity 1 only considers positive y and returns the first point with z > zThreshold; polarity -1 only considers
+    negative y and returns the last point with z beyond zThreshold (z > zThreshold for a positive threshold, z <
+    zThreshold otherwise); polarity 0 considers all y, like polarity 1. Segments without a crossing fall back to
+    their first (last for polarity -1) considered point, segments without any considered point give NaN. With
+    interpolate, y is linearly interpolated between the crossing point and the preceding point of the scan."""
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    index = np.arange(len(y))
+
+    if polarity > 0:
+        mask = y > 0
+    elif polarity < 0:
+        mask = y < 0
+    else:
+        mask = np.ones(len(y), dtype=bool)
+
+    if polarity < 0 and zThreshold <= 0:
+        crossed = mask & (z < zThreshold)
+    else:
+        crossed = mask & (z > zThreshold)
+
+    if polarity < 0:
+        crossing = segmentLastTrue(crossed, offsets)
+        fallback = segmentLastTrue(mask, offsets)
+        # The scan runs backwards, so the preceding point is the next considered point:
+        preceding = np.minimum.accumulate(np.where(mask, index, len(y))[::-1])[::-1]
+        preceding = np.append(preceding[1:], len(y))
+    else:
+        crossing = segmentFirstTrue(crossed, offsets)
+        fallback = segmentFirstTrue(mask, offsets)
+        preceding = np.maximum.accumulate(np.where(mask, index, -1))
+        preceding = np.insert(preceding[:-1], 0, -1)
+
+    found = crossing >= 0
+    chosen = np.where(found, crossing, fallback)
+    yCrossing = np.where(chosen >= 0, y[np.maximum(chosen, 0)], np.nan)
+
+    if interpolate and len(y) > 0:
+        ids = segmentIDs(offsets)
+        segments = np.flatnonzero(found)
+        k = crossing[segments]
+        p = preceding[k]
+        valid = (p >= 0) & (p < len(y))
+        valid[valid] = ids[p[valid]] == ids[k[valid]]
+        segments, k, p = segments[valid], k[valid], p[valid]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yInterpolated = y[p] + (zThreshold - z[p]) * (y[k] - y[p]) / (z[k] - z[p])
+        usable = np.isfinite(yInterpolated)
+        yCrossing[segments[usable]] = yInterpolated[usable]
+
+    return yCrossing
+
+
+def segmentSearchsorted(values, offsets, queries):
+    """Like np.searchsorted (side='left') for every segment and every query at once. Values must be sorted within
+    every segment. Returns global insertion indices with shape (amount of segments, amount of queries)."""
+    queries = np.asarray(queries, dtype=float)
+    amountOfSegments = len(offsets) - 1
+
+    allIDs = np.concatenate((segmentIDs(offsets), np.repeat(np.arange(amountOfSegments), len(queries))))
+    allValues = np.concatenate((values, np.tile(queries, amountOfSegments)))
+    isValue = np.concatenate((np.ones(len(values), dtype=np.int64), np.zeros(amountOfSegments * len(queries), dtype=np.int64)))
+
+    # Sort by segment, then value, with queries before equal values:
+    order = np.lexsort((isValue, allValues, allIDs))
+    valuesBefore = np.cumsum(isValue[order]) - isValue[order]
+
+    isQuery = order >= len(values)
+    position = np.empty(amountOfSegments * len(queries), dtype=np.int64)
+    position[order[isQuery] - len(values)] = valuesBefore[isQuery]
+    return position.reshape(amountOfSegments, len(queries))
+
+
+def segmentWindows(centers, offsets, halfWidth):
+    """Returns per segment the global indices of the 2*halfWidth+1 elements around its element centers[i], as the rows
+    of a 2D array, together with a mask of the valid ones. Windows at the edge of a segment are shifted to lie within
+    it; in segments shorter than a window, the window is the whole segment and the rest of the row is masked."""
+    width = 2 * halfWidth + 1
+    starts = np.asarray(offsets[:-1])
+    ends = np.asarray(offsets[1:])
+    first = np.clip(np.asarray(centers) - halfWidth, starts, np.maximum(ends - width, starts))
+    indices = first[:, np.newaxis] + np.arange(width)
+    valid = indices < ends[:, np.newaxis]
+    return np.where(valid, indices, first[:, np.newaxis]), valid
+
+
+def segmentMonotonicRuns(y, offsets):
+    """Splits every segment into runs along which y only increases or only decreases, e.g. the up and down branch of a
+    hysteretic sweep; consecutive runs share their turning point. Returns the global indices of the elements of all
+    runs, back-to-back and within every run in ascending y, the offsets of the runs into these indices, and the
+    segment of every run. Runs are ordered as they were measured."""
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray(offsets)
+    ids = segmentIDs(offsets)
+
+    # Direction of every step within a segment, where flat steps continue the direction before them:
+    step = np.sign(np.diff(y))
+    inSegment = ids[:-1] == ids[1:]
+    known = inSegment & (step != 0)
+    lastKnown = np.maximum.accumulate(np.where(known, np.arange(len(step)), -1))
+    direction = np.where((lastKnown >= 0) & (ids[np.maximum(lastKnown, 0)] == ids[:-1]), step[np.maximum(lastKnown, 0)], 0)
+
+    # A run turns at element i if the step into it and the step out of it go opposite ways:
+    turns = np.flatnonzero(inSegment[1:] & inSegment[:-1] & (direction[:-1] * step[1:] < 0)) + 1
+    runStarts = np.sort(np.concatenate((offsets[:-1], turns)))
+    runEnds = np.sort(np.concatenate((turns, offsets[1:] - 1)))
+
+    runLengths = runEnds - runStarts + 1
+    runOffsets = np.concatenate(([0], np.cumsum(runLengths))).astype(np.int64)
+    positionInRun = np.arange(runOffsets[-1]) - np.repeat(runOffsets[:-1], runLengths)
+    decreasing = np.repeat(y[runEnds] < y[runStarts], runLengths)
+    indices = np.where(decreasing, np.repeat(runEnds, runLengths) - positionInRun,
+                       np.repeat(runStarts, runLengths) + positionInRun)
+
+    return indices, runOffsets, ids[runStarts]
+
+
+def segmentInterpolationWeights(y, offsets, queries, nearest=False):
+    """Linear interpolation of every segment at every query y, in one pass. Segments need not be sorted: a query is
+    interpolated on the first monotonic run of its segment (see segmentMonotonicRuns) whose y range contains it, so
+    that up-and-down sweeps are not mixed. With nearest, the first measured point with the nearest y is taken, like
+    np.argmin(np.abs(y - query)), and weight is 0.
+    Returns (lower, upper, weight, outOfRange), each of shape (amount of segments, amount of queries), such that the
+    interpolated z is (1 - weight)*z[lower] + weight*z[upper]. Queries outside a segment's y range are clamped to its
+    edge value and flagged in outOfRange."""
+    y = np.asarray(y, dtype=float)
+    queries = np.asarray(queries, dtype=float)
+    amountOfSegments = len(offsets) - 1
+    if amountOfSegments == 0:
+        empty = np.zeros((0, len(queries)), dtype=np.int64)
+        return empty, empty.copy(), np.zeros((0, len(queries))), np.zeros((0, len(queries)), dtype=bool)
+
+    segmentMinima = np.fmin.reduceat(y, offsets[:-1])[:, np.newaxis]
+    segmentMaxima = np.fmax.reduceat(y, offsets[:-1])[:, np.newaxis]
+    outOfRange = (queries < segmentMinima) | (queries > segmentMaxima)
+
+    indices, runOffsets, runSegments = segmentMonotonicRuns(y, offsets)
+    yRuns = y[indices]
+    segmentRunOffsets = np.concatenate(([0], np.cumsum(np.bincount(runSegments, minlength=amountOfSegments))))
+
+    # The points bracketing every query on every run:
+    position = segmentSearchsorted(yRuns, runOffsets, queries)
+    first = runOffsets[:-1, np.newaxis]
+    last = runOffsets[1:, np.newaxis] - 1
+    upper = np.clip(position, first, last)
+    lower = np.clip(position - 1, first, last)
+    yLower = yRuns[lower]
+    yUpper = yRuns[upper]
+
+    # Of points with equal y within a run (a plateau), the first measured is taken:
+    newValue = np.ones(len(yRuns), dtype=bool)
+    newValue[1:] = yRuns[1:] != yRuns[:-1]
+    newValue[runOffsets[:-1]] = True
+    plateauStarts = np.flatnonzero(newValue)
+    firstMeasured = np.minimum.reduceat(indices, plateauStarts)
+    plateau = np.cumsum(newValue) - 1
+
+    if nearest:
+        # The nearest point of a run is one of its bracketing points; per segment the first measured of the nearest:
+        lowerDistance = np.abs(queries - yLower)
+        upperDistance = np.abs(queries - yUpper)
+        lowerPoint = firstMeasured[plateau[lower]]
+        upperPoint = firstMeasured[plateau[upper]]
+        distance = np.fmin(lowerDistance, upperDistance)
+        point = np.where(lowerDistance == upperDistance, np.minimum(lowerPoint, upperPoint),
+                         np.where(lowerDistance == distance, lowerPoint, upperPoint))
+
+        smallestDistance = np.fmin.reduceat(distance, segmentRunOffsets[:-1], axis=0)
+        isNearest = distance == np.repeat(smallestDistance, np.diff(segmentRunOffsets), axis=0)
+        nearestPoint = np.minimum.reduceat(np.where(isNearest, point, len(y)), segmentRunOffsets[:-1], axis=0)
+        nearestPoint = np.where(nearestPoint == len(y), np.asarray(offsets)[:-1, np.newaxis], nearestPoint) # Only NaNs
+        return nearestPoint, nearestPoint.copy(), np.zeros(nearestPoint.shape), outOfRange
+
+    # Interpolation on every run:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(yUpper > yLower, (queries - yLower) / (yUpper - yLower), 0.0)
+    weight = np.clip(weight, 0.0, 1.0)
+    lower = np.where(weight == 0, firstMeasured[plateau[lower]], indices[lower])
+    upper = np.where(weight == 1, firstMeasured[plateau[upper]], indices[upper])
+
+    # The run to use per segment and query: the first measured of those nearest to (or containing) the query:
+    distance = np.maximum(np.maximum(yRuns[first] - queries, queries - yRuns[last]), 0)
+    smallestDistance = np.fmin.reduceat(distance, segmentRunOffsets[:-1], axis=0)
+    isNearest = distance == np.repeat(smallestDistance, np.diff(segmentRunOffsets), axis=0)
+    runNumber = np.arange(len(runSegments))[:, np.newaxis]
+    chosenRun = np.minimum.reduceat(np.where(isNearest, runNumber, len(runSegments)), segmentRunOffsets[:-1], axis=0)
+    chosenRun = np.minimum(chosenRun, segmentRunOffsets[1:, np.newaxis] - 1) # Runs without y values
+
+    lower = np.take_along_axis(lower, chosenRun, axis=0)
+    upper = np.take_along_axis(upper, chosenRun, axis=0)
+    weight = np.take_along_axis(weight, chosenRun, axis=0)
+    return lower, upper, weight, outOfRange
+
+
+class LinearFit(NamedTuple):
+    """Least-squares fit y = slope*x + intercept per segment, with standard errors. Segments with fewer than two
+    distinct x values get a NaN slope, segments with fewer than three points NaN errors."""
+    slope: np.ndarray
+    intercept: np.ndarray
+    slopeError: np.ndarray
+    interceptError: np.ndarray
+
+
+def segmentSums(values, offsets):
+    return np.add.reduceat(values, offsets[:-1])
+
+
+def segmentSort(values, offsets):
+    """Returns the columns of a 2D array (elements along the first axis) sorted within every segment, NaNs last."""
+    lengths = segmentLengths(offsets)
+    if len(lengths) > 0 and np.all(lengths == lengths[0]):
+        # Equally long segments are sorted as the rows of one array:
+        return np.sort(values.reshape(len(lengths), lengths[0], -1), axis=1).reshape(values.shape)
+
+    # Else the elements are ranked within their column, and the ranks, offset per segment, are sorted as integers:
+    amount = len(values)
+    order = np.argsort(values, axis=0)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(amount)[:, np.newaxis], axis=0)
+    keys = np.sort(segmentIDs(offsets)[:, np.newaxis] * amount + ranks, axis=0)
+    return np.take_along_axis(values, np.take_along_axis(order, keys % amount, axis=0), axis=0)
+
+
+class SegmentStatistics(NamedTuple):
+    mean: np.ndarray
+    std: np.ndarray
+    median: np.ndarray
+    count: np.ndarray # Amount of non-NaN elements
+
+
+def segmentStatistics(values, offsets):
+    """Returns the mean, standard deviation (like np.std), median and count of every segment, ignoring NaNs. Values
+    may be 2D with the elements along the first axis, to reduce many quantities in the same pass; the statistics then
+    have one column per quantity. Segments without valid elements give NaN."""
+    values = np.asarray(values, dtype=float)
+    lengths = segmentLengths(offsets)
+    valid = ~np.isnan(values)
+
+    count = segmentSums(valid.astype(np.int64), offsets)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = segmentSums(np.where(valid, values, 0), offsets) / count
+        deviation = np.where(valid, values - np.repeat(mean, lengths, axis=0), 0)
+        std = np.sqrt(segmentSums(deviation * deviation, offsets) / count)
+
+    # Medians from the elements sorted within their segment, NaNs last:
+    ordered = segmentSort(values if values.ndim == 2 else values[:, np.newaxis], offsets)
+    counts = count if count.ndim == 2 else count[:, np.newaxis]
+    medians = np.full(counts.shape, np.nan)
+    for column in range(ordered.shape[1]):
+        hasValid = counts[:, column] > 0
+        lower = offsets[:-1][hasValid] + (counts[hasValid, column] - 1) // 2
+        upper = offsets[:-1][hasValid] + counts[hasValid, column] // 2
+        medians[hasValid, column] = (ordered[lower, column] + ordered[upper, column]) / 2
+
+    return SegmentStatistics(mean=mean, std=std, median=medians.reshape(mean.shape), count=count)
+
+
+def segmentLinearFit(x, y, offsets):
+    """Fits a straight line through every segment at once, in closed form from (centered) segment sums."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    lengths = segmentLengths(offsets)
+
+    meanX = segmentSums(x, offsets) / lengths
+    meanY = segmentSums(y, offsets) / lengths
+    dx = x - np.repeat(meanX, lengths)
+    dy = y - np.repeat(meanY, lengths)
+    Sxx = segmentSums(dx * dx, offsets)
+    Sxy = segmentSums(dx * dy, offsets)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = Sxy / Sxx
+        intercept = meanY - slope * meanX
+
+        residuals = dy - np.repeat(slope, lengths) * dx
+        variance = segmentSums(residuals * residuals, offsets) / (lengths - 2)
+        variance[lengths <= 2] = np.nan
+        slopeError = np.sqrt(variance / Sxx)
+        interceptError = np.sqrt(variance * (1 / lengths + meanX**2 / Sxx))
+
+    return LinearFit(slope=slope, intercept=intercept, slopeError=slopeError, interceptError=interceptError)
@@ -0,0 +1,95 @@
+import os
+import warnings
+
+import numpy as np
+
+from Model.ColumnTable import ColumnTable
+
+
+class SegmentReader():
+    """Reads a measurement file incrementally, handing out only completed single measurements.
+
+    The reader remembers how many bytes of the file it has consumed (always up to a line end) and keeps the rows of
+    the last single measurement it has seen, since rows may still be added to it by the next chunk, or by the
+    instrument if the file is still being written. Memory use is bounded by the chunk size plus one single
+    measurement, independent of the file size."""
+    def __init__(self, path, segmentStarts, chunkBytes=64 * 1024**2):
+        """SegmentStarts: callable returning, for a ColumnTable, the row indices at which single measurements start.
+        ChunkBytes: amount of text parsed per call of read()."""
+        self.path = path
+        self.segmentStarts = segmentStarts
+        self.chunkBytes = chunkBytes
+        self.offset = 0 # Bytes of the file consumed so far
+        self.titles = None
+        self._carry = None # Rows of the last single measurement seen, shape (columns, rows)
+
+    @property
+    def atEnd(self):
+        return self.offset >= os.path.getsize(self.path)
+
+    def read(self, final=False):
+        """Parses the next chunk of complete lines and returns a ColumnTable holding the single measurements that are
+        now complete, or None if there are none. The last single measurement is held back, unless final is set and
+        the end of the file is reached."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            if self.titles is None:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return None
+                self.titles = header.decode().split()
+                self.offset = f.tell()
+
+            block = f.read(self.chunkBytes)
+
+        # Only consume complete lines; a partially written last line is read again next time:
+        end = block.rfind(b"\n") + 1
+        if final and end < len(block) and len(block) < self.chunkBytes:
+            end = len(block)
+        self.offset += end
+        data = self._parse(block[:end])
+
+        if self._carry is not None:
+            data = np.concatenate((self._carry, data), axis=1) if data.shape[1] > 0 else self._carry
+        self._carry = None
+        if data.shape[1] == 0:
+            return None
+
+        if final and self.atEnd:
+            return ColumnTable(titles=self.titles, data=data)
+
+        starts = self.segmentStarts(ColumnTable(titles=self.titles, data=data))
+        last = starts[-1]
+        self._carry = np.ascontiguousarray(data[:, last:])
+        if last == 0:
+            return None
+        return ColumnTable(titles=self.titles, data=np.ascontiguousarray(data[:, :last]))
+
+    def readAvailable(self, final=False):
+        """Yields ColumnTables of completed single measurements until the complete lines available in the file are
+        used up. With final, the single measurement held back at the end of the file is handed out as well."""
+        while True:
+            offset = self.offset
+            table = self.read()
+            if table is not None:
+                yield table
+            if self.offset == offset:
+                break
+
+        if final:
+            table = self.read(final=True)
+            if table is not None:
+                yield table
+
+    def _parse(self, text):
+        lines = text.decode().splitlines()
+        if not any(line.strip() for line in lines):
+            return np.zeros((len(self.titles), 0))
+
+        try:
+            data = np.loadtxt(lines, ndmin=2)
+        except ValueError:
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", message="ConversionWarning: Some errors were detected !")
+                data = np.genfromtxt(lines, invalid_raise=False, ndmin=2)
+        return np.ascontiguousarray(data.T)
@@ -1,114 +1,93 @@
 from Model.Model import VectorMagnetModel
 from Model.TransportMeasurement import TransportMeasurement
+from Model.SegmentOperations import segmentArgmin, segmentLengths, segmentLinearFit
 from Model.SingleMeasurement import SingleMeasurement
-from DataCapsule.DataCapsules import RegularData3D, IrregularData3D, Data2D
+from DataCapsule.DataCapsules import IrregularData3D, Data2D
 from typing import NamedTuple
 import numpy as np
-from scipy.optimize import curve_fit
 
 class Synktek(VectorMagnetModel, TransportMeasurement):
-    def __init__(self, paths, invertVoltage=False):
+    quantities = ("current", "voltage", "dVdI")
+
+    def __init__(self, paths, invertVoltage=False, progressCallback=None, follow=False, useColumnCache=False,
+                 loadWorkers=1):
         self.invertVoltage = invertVoltage
-        super().__init__(paths)
-
-    def loadDataFromFile(self, path):
-        VTITemperature, sampleTemperature, Bx, By, Bz = self.vectorMagnetTemperatureAndField(path)
-        currentPerDevice, voltagePerDevice, dvdiPerDevice = self.loadCurrentAndVoltagePerDevice(path)
-        singleMeasurementFirstIndices = self.singleMeasurementFirstIndices([VTITemperature, sampleTemperature, Bx, By, Bz])
-
-        for i, start in enumerate(singleMeasurementFirstIndices):
-            if i < len(singleMeasurementFirstIndices) - 1:
-                end = singleMeasurementFirstIndices[i+1]
-            else:
-                end = len(VTITemperature)
-
-            ivPerDevice = []
-            for deviceID in range(len(currentPerDevice)):
-                current, voltage, dVdI = self.fixOrigin(currentPerDevice[deviceID][start:end],
-                                                        voltagePerDevice[deviceID][start:end],
-                                                        dvdiPerDevice[deviceID][start:end])
-                iv = SynktekIV(current = current,
-                               voltage = voltage,
-                               dVdI = dVdI)
-                ivPerDevice.append(iv)
-            self._data.append(SynktekData(VTITemperature[start],
-                                      sampleTemperature[start],
-                                      Bx[start],
-                                      By[start],
-                                      Bz[start],
-                                      ivPerDevice))
-
-    def fixOrigin(self, current, voltage, dvdi):
-        argmin = np.argmin(np.abs(current))
-        voltage = voltage - voltage[argmin] # Enforce I = 0 -> V = 0
+        super().__init__(paths, progressCallback=progressCallback, follow=follow, useColumnCache=useColumnCache,
+                         loadWorkers=loadWorkers)
+
+    def loadDataFromTable(self, table):
+        environment = self.vectorMagnetTemperatureAndField(table)
+        currentPerDevice, voltagePerDevice, dvdiPerDevice = self.loadCurrentAndVoltagePerDevice(table)
+        singleMeasurementFirstIndices = self.singleMeasurementFirstIndices(environment)
+        offsets = np.append(singleMeasurementFirstIndices, len(environment[0]))
+
+        for deviceID in range(len(currentPerDevice)):
+            currentPerDevice[deviceID], voltagePerDevice[deviceID], dvdiPerDevice[deviceID] = \
+                self.fixOrigin(currentPerDevice[deviceID], voltagePerDevice[deviceID], dvdiPerDevice[deviceID], offsets)
+
+        self._data.append(singleMeasurementFirstIndices, environment,
+                          {"current": currentPerDevice, "voltage": voltagePerDevice, "dVdI": dvdiPerDevice})
+
+    def singleMeasurement(self, index):
+        ivPerDevice = []
+        for deviceID in range(self._data.amountOfDevices):
+            ivPerDevice.append(SynktekIV(current=self._data.segment("current", deviceID, index),
+                                         voltage=self._data.segment("voltage", deviceID, index),
+                                         dVdI=self._data.segment("dVdI", deviceID, index)))
+        return SynktekData(*self._data.environmentOf(index), ivPerDevice)
+
+    def fixOrigin(self, current, voltage, dvdi, offsets):
+        """Enforces I = 0 -> V = 0 for every single measurement, given by the segment offsets."""
+        if len(current) == 0:
+            return current, voltage, dvdi
+
+        argmin = segmentArgmin(np.abs(current), offsets)
+        origin = np.where(np.isnan(current[argmin]), 0, voltage[argmin]) # Segments without currents are kept as they are
+        voltage = voltage - np.repeat(origin, segmentLengths(offsets))
         if self.invertVoltage:
             voltage = -1*voltage
         return current, voltage, dvdi
 
 
 
-    def loadCurrentAndVoltagePerDevice(self, path):
-        return self.load3DDataForVectorMagnet(path, "I_DC", "DC", "dV/dI")
+    def loadCurrentAndVoltagePerDevice(self, table):
+        return self.load3DDataForVectorMagnet(table, "I_DC", "DC", "dV/dI")
 
     def sweepResistance(self, sweepType, deviceID=0):
-        """Returns (x,R) data for some environmental x."""
-        x = np.zeros(len(self._data))
-        y = np.zeros_like(x)
+        """Returns (x,R) data for some environmental x, with the standard error of R as y-error. Single-point
+        measurements use the measured dV/dI instead."""
+        offsets = self._data.offsets
+        fit = segmentLinearFit(self._data.column("current", deviceID), self._data.column("voltage", deviceID), offsets)
 
-        for i in range(len(x)):
-            x[i] = self._data[i].environmental(sweepType)
-            y[i] = self._data[i].resistance(deviceID=deviceID)
+        singlePoint = segmentLengths(offsets) == 1
+        resistance = np.where(singlePoint, self._data.column("dVdI", deviceID)[offsets[:-1]], fit.slope)
 
-        return Data2D(x,y)
+        return Data2D(self._data.environmental(sweepType).copy(), resistance, yerr=fit.slopeError)
 
     def sweepIV(self, sweepType, deviceID=0):
         """Returns (x,I,V) data for some environmental variable x."""
-        x = np.zeros(len(self._data))
-        I = []
-        V = []
-
-        for i, data in enumerate(self._data):
-            x[i] = data.environmental(sweepType)
-            I.append(data.IVPerDevice[deviceID].current)
-            V.append(data.IVPerDevice[deviceID].voltage)
-
-        capsule = IrregularData3D(x, I, V)
+        capsule = IrregularData3D(self._data.environmental(sweepType).copy(),
+                                  self._data.segments("current", deviceID),
+                                  self._data.segments("voltage", deviceID))
         return capsule
 
     def sweepIdVdI(self, sweepType, deviceID=0):
         """Returns (x,I,V) data for some environmental variable x."""
-        x = np.zeros(len(self._data))
-        I = []
-        dVdI = []
-
-        for i, data in enumerate(self._data):
-            x[i] = data.environmental(sweepType)
-            I.append(data.IVPerDevice[deviceID].current)
-            dVdI.append(data.IVPerDevice[deviceID].dVdI)
-
-        capsule = IrregularData3D(x, I, dVdI)
+        capsule = IrregularData3D(self._data.environmental(sweepType).copy(),
+                                  self._data.segments("current", deviceID),
+                                  self._data.segments("dVdI", deviceID))
 
         return capsule
 
-    def removeSeriesResistance(self, deviceID=0, Npoints=4):
-        smallestResistance = np.inf
-
-        for ivdata in self._data:
-            current = ivdata.IVPerDevice[deviceID].current
-            dvdi = ivdata.IVPerDevice[deviceID].dVdI
-            centerIndex = np.argmin(np.abs(current))
-            smallestResistance = np.min(dvdi[centerIndex-Npoints:centerIndex+Npoints])
+    def zeroBiasResistances(self, deviceID=0, Npoints=4):
+        """Smallest measured dV/dI around zero current of every single measurement."""
+        indices, valid = self._zeroBiasWindows(deviceID, Npoints)
+        dvdi = self._data.column("dVdI", deviceID)[indices]
+        return np.where(valid, dvdi, np.inf).min(axis=1)
 
-        if smallestResistance > 0:
-            print("Subtracting residual resistance of", round(smallestResistance*1e3), "mOhms")
-
-            for i, ivdata in enumerate(self._data):
-                newIV = KeithleyIV(current=ivdata.IVPerDevice[deviceID].current,
-                                   voltage=ivdata.IVPerDevice[deviceID].voltage - ivdata.IVPerDevice[deviceID].current*smallestResistance,
-                                   dVdI=ivdata.IVPerDevice[deviceID].dVdI - smallestResistance)
-                self._data[i].IVPerDevice[deviceID] = newIV
-        else:
-            print("Smallest resistance was non-positive, not modifying dataset.")
+    def subtractSeriesResistance(self, resistance, deviceID=0):
+        super().subtractSeriesResistance(resistance, deviceID=deviceID)
+        self._data.setColumn("dVdI", deviceID, self._data.column("dVdI", deviceID) - resistance)
 
 
 
@@ -129,8 +108,7 @@ class SynktekData(SingleMeasurement):
         iv = self.IVPerDevice[deviceID]
 
         if len(iv.current) > 1:
-            params, _ = curve_fit(lambda x, a, b: a*x+b, iv.current, iv.voltage, p0=[iv.voltage[0]/iv.current[0], 0.0])
-            return params[0]
+            return segmentLinearFit(iv.current, iv.voltage, [0, len(iv.current)]).slope[0]
         else:
             return iv.dVdI[0]
 
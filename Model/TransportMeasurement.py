@@ -1,14 +1,26 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from itertools import compress
 
 import numpy as np
 
 from DataCapsule.DataCapsules import RegularData3D, IrregularData3D, Data2D, Label
 from Model.SingleMeasurement import SweepTypes
+from Model.SegmentOperations import segmentThresholdCrossing, segmentInterpolationWeights, segmentArgmin, \
+    segmentWindows
 from View.SILabel import SILabel, PlotUnits, PlotScales
 
 
 class TransportMeasurement(ABC):
+    sweepCacheSize = 8 # Amount of sweep results kept in memory per measurement
+
+    # Resampling of irregular sweeps onto a shared current axis, so that all sweeps are RegularData3D. Call
+    # invalidateSweepCache() after changing these on an existing measurement.
+    resampleIrregular = False
+    resampleAxis = 'union' # 'union' or 'intersection' of the current ranges of all curves, or an array of currents
+    resamplePoints = None # Amount of points on the current axis; defaults to the length of the longest curve
+    resampleMaskOutOfRange = True # Set z to NaN where the axis lies outside a curve's current range
+
     @abstractmethod
     def sweepIV(self, sweepType, deviceID=0):
         pass
@@ -18,131 +30,224 @@ class TransportMeasurement(ABC):
         pass
 
     @abstractmethod
-    def removeSeriesResistance(self, deviceID=0, Npoints=4):
+    def zeroBiasResistances(self, deviceID=0, Npoints=4):
+        # Returns the resistance around zero current of every single measurement, from about 2*Npoints+1 points
         pass
 
     @abstractmethod
     def sweepResistance(self, sweepType, deviceID=0):
         pass
 
-    def ICFromIdVdI(self, sweepType, dVdIThreshold, deviceID=0, positiveCurrent = True, sweepRange = None, selection = None):
-        dataCapsule = self.sweepIdVdI(sweepType, deviceID=deviceID)
-        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection = selection)
+    def removeSeriesResistance(self, deviceID=0, Npoints=4, verbose=False):
+        """Estimates the zero-bias resistance of all single measurements at once and subtracts the smallest from the
+        whole dataset as series resistance. Returns the per-measurement estimates; with verbose, their distribution
+        is printed too."""
+        resistances = self.zeroBiasResistances(deviceID=deviceID, Npoints=Npoints)
+        if len(resistances) == 0 or np.all(np.isnan(resistances)):
+            if verbose:
+                print("No zero-bias resistance could be estimated, not modifying dataset.")
+            return resistances
+
+        low, median, high = np.nanpercentile(resistances, [0, 50, 100])
+        if verbose:
+            print("Zero-bias resistance of", len(resistances), "single measurements: min", round(low*1e3), "median",
+                  round(median*1e3), "max", round(high*1e3), "mOhms")
+
+        if low > 0:
+            print("Subtracting residual resistance of", round(low*1e3), "mOhms")
+            self.subtractSeriesResistance(low, deviceID=deviceID)
+        elif verbose:
+            print("Smallest resistance was non-positive, not modifying dataset.")
+        return resistances
+
+    def subtractSeriesResistance(self, resistance, deviceID=0):
+        current = self._data.column("current", deviceID)
+        self._data.setColumn("voltage", deviceID, self._data.column("voltage", deviceID) - current*resistance)
+
+    def _zeroBiasWindows(self, deviceID, Npoints):
+        # Windows of 2*Npoints+1 points around the smallest |I| of every single measurement (see segmentWindows)
+        offsets = self._data.offsets
+        centers = segmentArgmin(np.abs(self._data.column("current", deviceID)), offsets)
+        return segmentWindows(centers, offsets, Npoints)
+
+    def _cachedSweep(self, sweepFunction, sweepType, deviceID=0):
+        """Returns sweepFunction(sweepType, deviceID=deviceID), reusing an earlier result if the data did not change
+        since. Results are shared between callers and must not be modified in place."""
+        version = self._data.version
+        if getattr(self, "_sweepCache", None) is None or self._sweepCacheVersion != version:
+            self._sweepCache = OrderedDict()
+            self._sweepCacheVersion = version
+
+        key = (sweepFunction.__name__, sweepType, deviceID)
+        if key in self._sweepCache:
+            self._sweepCache.move_to_end(key)
+            return self._sweepCache[key]
+
+        result = sweepFunction(sweepType, deviceID=deviceID)
+        if self.resampleIrregular and isinstance(result, IrregularData3D):
+            result = self.resampleToRegular(result, yAxis=self.resampleAxis, amountOfPoints=self.resamplePoints,
+                                            maskOutOfRange=self.resampleMaskOutOfRange)
+        self._sweepCache[key] = result
+        while len(self._sweepCache) > self.sweepCacheSize:
+            self._sweepCache.popitem(last=False)
+        return result
+
+    def invalidateSweepCache(self):
+        self._sweepCache = None
+
+    def resampleToRegular(self, dataCapsule, yAxis='union', amountOfPoints=None, maskOutOfRange=True):
+        """Linearly interpolates every curve of an IrregularData3D onto one shared y (current) axis, all curves in a
+        single vectorized pass, and returns the result as RegularData3D.
+        YAxis: 'union' spans the y ranges of all curves, 'intersection' only the range measured by every curve; an
+        array is used as the axis itself.
+        AmountOfPoints: length of a 'union' or 'intersection' axis, by default that of the longest curve.
+        MaskOutOfRange: set z to NaN where the axis lies outside the y range of a curve, instead of the curve's edge
+        value."""
         if isinstance(dataCapsule, RegularData3D):
-            return self._ICFromRegularData3D(dVdIThreshold, dataCapsule, posyonly=positiveCurrent, negyonly=not positiveCurrent)
-        elif isinstance(dataCapsule, IrregularData3D):
-            return self._ICFromIrregularData(dVdIThreshold, dataCapsule, posyonly=positiveCurrent, negyonly=not positiveCurrent)
-        else:
-            raise TypeError("Unknown datacapsule type.")
+            return dataCapsule
 
-    def getResistance(self, sweepType, deviceID=0, selection=None, sweepRange=None):
-        resistances = self.sweepResistance(sweepType, deviceID=deviceID)
-        resistances = self._selectSweepValuesDataCapsule(resistances, sweepRange=sweepRange, selection=selection)
-        return resistances
+        xs, y, z, offsets = self._segmentsFromDataCapsule(dataCapsule)
+        lengths = np.diff(offsets)
 
-    def getConstantBias(self, sweepType, yb, deviceID=0, selection=None, sweepRange=None):
-        allIVs = self.sweepIV(sweepType, deviceID=deviceID)
-        allIVs = self._selectSweepValuesDataCapsule(allIVs, sweepRange=sweepRange, selection=selection)
+        if isinstance(yAxis, str):
+            if len(xs) == 0:
+                axis = np.zeros(0)
+            else:
+                minima = np.minimum.reduceat(y, offsets[:-1])
+                maxima = np.maximum.reduceat(y, offsets[:-1])
+                if yAxis == 'union':
+                    y0, y1 = np.min(minima), np.max(maxima)
+                elif yAxis == 'intersection':
+                    y0, y1 = np.max(minima), np.min(maxima)
+                    if y0 > y1:
+                        raise ValueError("The curves have no y range in common.")
+                else:
+                    raise ValueError("Unknown resampling axis: " + yAxis)
+                axis = np.linspace(y0, y1, amountOfPoints if amountOfPoints is not None else np.max(lengths))
+        else:
+            axis = np.asarray(yAxis, dtype=float)
 
-        if isinstance(allIVs, RegularData3D):
-            return self._getConstantBiasRegular(allIVs, yb)
-        elif isinstance(allIVs, IrregularData3D):
-            return self._getConstantBiasIrregular(allIVs, yb)
+        if len(xs) == 0:
+            return RegularData3D(np.zeros(0), axis, np.zeros((len(axis), 0)), label=dataCapsule.label)
 
-    def _getConstantBiasRegular(self, allIVs, yb):
-        xs = allIVs.xx[0,:]
-        ys = allIVs.yy[:,0]
-        index = np.argmin(np.abs(ys - yb))
-        zs = allIVs.zz[index,:]
+        lower, upper, weight, outOfRange = segmentInterpolationWeights(y, offsets, axis)
+        zz = ((1 - weight) * z[lower] + weight * z[upper]).T
+        if maskOutOfRange:
+            zz[outOfRange.T] = np.nan
 
-        curve = Data2D(xs, zs)
-        curve.labelfloat = yb
+        return RegularData3D(np.asarray(xs, dtype=float), axis, zz, label=dataCapsule.label)
 
-        return curve
+    def getSQI(self, sweepType, deviceID=0, dVdI=False):
+        """Gets the (x, I, V) or (x, I, dV/dI) map of the underlying dataset."""
+        if dVdI:
+            return self._cachedSweep(self.sweepIdVdI, sweepType, deviceID=deviceID)
+        else:
+            return self._cachedSweep(self.sweepIV, sweepType, deviceID=deviceID)
 
-    def _getConstantBiasIrregular(self, allIVs, yb):
-        xs = allIVs.x
-        zs = np.zeros_like(xs)
-        for i, x in enumerate(xs):
-            y = allIVs.ylist[i]
-            index = np.argmin(np.abs(y - yb))
-            zs[i] = allIVs.zlist[i][index]
+    def ICFromIdVdI(self, sweepType, dVdIThreshold, deviceID=0, positiveCurrent = True, sweepRange = None, selection = None,
+                    interpolate = False):
+        dataCapsule = self._cachedSweep(self.sweepIdVdI, sweepType, deviceID=deviceID)
+        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection = selection)
+        return self._ICFromDataCapsule(dVdIThreshold, dataCapsule, 1 if positiveCurrent else -1, interpolate)
 
-        curve = Data2D(xs, zs)
-        curve.labelfloat = yb
+    def ICsFromIdVdI(self, sweepType, dVdIThreshold, deviceID=0, sweepRange = None, selection = None, interpolate = False):
+        """Returns (Ic+, Ic-): the currents at which dV/dI first exceeds the threshold, for both current polarities."""
+        dataCapsule = self._cachedSweep(self.sweepIdVdI, sweepType, deviceID=deviceID)
+        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection = selection)
+        return (self._ICFromDataCapsule(dVdIThreshold, dataCapsule, 1, interpolate),
+                self._ICFromDataCapsule(dVdIThreshold, dataCapsule, -1, interpolate))
 
-        return curve
+    def getResistance(self, sweepType, deviceID=0, selection=None, sweepRange=None):
+        resistances = self._cachedSweep(self.sweepResistance, sweepType, deviceID=deviceID)
+        resistances = self._selectSweepValuesDataCapsule(resistances, sweepRange=sweepRange, selection=selection)
+        return resistances
 
+    def getConstantBias(self, sweepType, yb, deviceID=0, selection=None, sweepRange=None, interpolate=False):
+        return self.getConstantBiases(sweepType, [yb], deviceID=deviceID, selection=selection, sweepRange=sweepRange,
+                                      interpolate=interpolate)[0]
 
-    def ICFromIV(self, sweepType, vThreshold, deviceID=0, positiveCurrent = True, sweepRange = None, selection = None):
-        dataCapsule = self.sweepIV(sweepType, deviceID=deviceID)
-        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection=selection)
-        if isinstance(dataCapsule, RegularData3D):
-            return self._ICFromRegularData3D(vThreshold, dataCapsule, posyonly=positiveCurrent, negyonly=not positiveCurrent)
-        elif isinstance(dataCapsule, IrregularData3D):
-            return self._ICFromIrregularData(vThreshold, dataCapsule, posyonly=positiveCurrent, negyonly=not positiveCurrent)
+    def getConstantBiases(self, sweepType, ybiases, deviceID=0, selection=None, sweepRange=None, interpolate=False):
+        """Returns one (x, V) cut at constant bias per value in ybiases, all computed in a single pass over the grid.
+        Uses the nearest measured bias, or linear interpolation between the two neighbouring biases."""
+        allIVs = self._cachedSweep(self.sweepIV, sweepType, deviceID=deviceID)
+        allIVs = self._selectSweepValuesDataCapsule(allIVs, sweepRange=sweepRange, selection=selection)
+        ybiases = np.atleast_1d(np.asarray(ybiases, dtype=float))
+
+        if isinstance(allIVs, RegularData3D) and allIVs.y is not None:
+            xs, zs = self._getConstantBiasesRegular(allIVs, ybiases, interpolate)
+        elif isinstance(allIVs, RegularData3D) or isinstance(allIVs, IrregularData3D):
+            xs, zs = self._getConstantBiasesIrregular(allIVs, ybiases, interpolate)
         else:
             raise TypeError("Unknown datacapsule type.")
 
-    def _ICFromRegularData3D(self, zThreshold: float, regularDataCapsule: RegularData3D, posyonly=False, negyonly=False):
-        x = regularDataCapsule.xx[0, :]
-        II = regularDataCapsule.yy
-        zz = regularDataCapsule.zz
-        Ic = np.zeros_like(x)
-
-        if posyonly:
-            mask = II > 0
-        elif negyonly:
-            mask = II < 0
-        else:
-            mask = II > -np.inf
+        curves = []
+        for yb, z in zip(ybiases, zs):
+            curve = Data2D(xs, z)
+            curve.labelfloat = yb
+            curves.append(curve)
 
-        for i in range(len(x)):
-            I = II[:,i][mask[:,i]]
-            z = zz[:,i][mask[:,i]]
+        return curves
 
-            if negyonly:
-                if zThreshold > 0:
-                    Ic[i] = (I[::-1])[np.argmax(z[::-1] > zThreshold)]
-                else:
-                    Ic[i] = (I[::-1])[np.argmax(z[::-1] < zThreshold)]
-            else:
-                Ic[i] = I[np.argmax(z > zThreshold)]  # I[np.argmin(np.abs(z - zThreshold))]
+    def _getConstantBiasesRegular(self, allIVs, ybiases, interpolate):
+        """All columns share one current axis, so the weights are computed once and applied to whole grid rows."""
+        xs = allIVs.x
+        ys = allIVs.y
+        lower, upper, weight, _ = segmentInterpolationWeights(ys, np.array([0, len(ys)]), ybiases,
+                                                              nearest=not interpolate)
+        lower, upper, weight = lower[0], upper[0], weight[0, :, np.newaxis]
+        zs = (1 - weight) * allIVs.zz[lower, :] + weight * allIVs.zz[upper, :]
 
+        return xs, zs
 
-        return Data2D(x, Ic)
+    def _getConstantBiasesIrregular(self, allIVs, ybiases, interpolate):
+        xs, y, z, offsets = self._segmentsFromDataCapsule(allIVs)
+        if len(xs) == 0:
+            return xs, np.zeros((len(ybiases), 0))
 
-    def _ICFromIrregularData(self, zThreshold: float, irregularDataCapsule: IrregularData3D, posyonly=False, negyonly=False):
-        x = irregularDataCapsule.x
-        Ilist = irregularDataCapsule.ylist
-        zlist = irregularDataCapsule.zlist
-        Ic = np.zeros_like(x)
+        lower, upper, weight, _ = segmentInterpolationWeights(y, offsets, ybiases, nearest=not interpolate)
+        zs = (1 - weight) * z[lower] + weight * z[upper]
 
-        for i, I in enumerate(Ilist):
-            z = zlist[i]
+        return xs, zs.T
 
-            if posyonly:
-                mask = I > 0
-            elif negyonly:
-                mask = I < 0
-            else:
-                mask = I > -np.inf
 
-            z = z[mask]
-            if negyonly:
-                if zThreshold > 0:
-                    Ic[i] = ((I[mask])[::-1])[np.argmax(z[::-1] > zThreshold)]
-                else:
-                    Ic[i] = ((I[mask])[::-1])[np.argmax(z[::-1] < zThreshold)]
-            else:
-                Ic[i] = I[mask][np.argmax(z > zThreshold)]
+    def ICFromIV(self, sweepType, vThreshold, deviceID=0, positiveCurrent = True, sweepRange = None, selection = None,
+                 interpolate = False):
+        dataCapsule = self._cachedSweep(self.sweepIV, sweepType, deviceID=deviceID)
+        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection=selection)
+        return self._ICFromDataCapsule(vThreshold, dataCapsule, 1 if positiveCurrent else -1, interpolate)
 
+    def ICsFromIV(self, sweepType, vThreshold, deviceID=0, sweepRange = None, selection = None, interpolate = False):
+        """Returns (Ic+, Ic-): the currents at which V first exceeds vThreshold at positive current, and drops below
+        -vThreshold at negative current."""
+        dataCapsule = self._cachedSweep(self.sweepIV, sweepType, deviceID=deviceID)
+        dataCapsule = self._selectSweepValuesDataCapsule(dataCapsule, sweepRange=sweepRange, selection=selection)
+        return (self._ICFromDataCapsule(vThreshold, dataCapsule, 1, interpolate),
+                self._ICFromDataCapsule(-vThreshold, dataCapsule, -1, interpolate))
 
+    def _ICFromDataCapsule(self, zThreshold, dataCapsule, polarity, interpolate=False):
+        """Finds the threshold crossing of all curves in one vectorized pass over their concatenation."""
+        x, y, z, offsets = self._segmentsFromDataCapsule(dataCapsule)
+        Ic = segmentThresholdCrossing(y, z, offsets, zThreshold, polarity=polarity, interpolate=interpolate)
         return Data2D(x, Ic)
 
+    def _segmentsFromDataCapsule(self, dataCapsule):
+        """Returns x and the concatenated y and z of all curves, with the segment offsets of the curves."""
+        if isinstance(dataCapsule, RegularData3D):
+            x = dataCapsule.x
+            amountOfRows = np.shape(dataCapsule.zz)[0]
+            offsets = np.arange(len(x) + 1) * amountOfRows
+            return x, dataCapsule.yy.T.ravel(), dataCapsule.zz.T.ravel(), offsets
+        elif isinstance(dataCapsule, IrregularData3D):
+            offsets = np.concatenate(([0], np.cumsum([len(y) for y in dataCapsule.ylist]))).astype(np.int64)
+            if len(dataCapsule.ylist) == 0:
+                return dataCapsule.x, np.zeros(0), np.zeros(0), offsets
+            return dataCapsule.x, np.concatenate(dataCapsule.ylist), np.concatenate(dataCapsule.zlist), offsets
+        else:
+            raise TypeError("Unknown datacapsule type.")
+
     def getIVs(self, sweepType, deviceID=0, sweepRange=None, selection=None):
         """Gets IV curves from the underlying dataset. """
-        dataCapsule = self.sweepIV(sweepType, deviceID=deviceID)
+        dataCapsule = self._cachedSweep(self.sweepIV, sweepType, deviceID=deviceID)
         if isinstance(dataCapsule, RegularData3D):
             return self._getIVRegular(dataCapsule, sweepType, sweepRange = sweepRange, selection = selection)
         elif isinstance(dataCapsule, IrregularData3D):
@@ -152,7 +257,7 @@ class TransportMeasurement(ABC):
 
     def _getIVRegular(self, dataCapsule, sweepType, sweepRange = None, selection = None):
         dataCapsules2D = []
-        xs = dataCapsule.xx[0,:]
+        xs = dataCapsule.x
         mask = self._getMaskForX(xs, sweepRange=sweepRange, selection=selection)
 
         if sweepType == SweepTypes.B_X or sweepType == SweepTypes.B_Y or sweepType == SweepTypes.B_Z:
@@ -163,7 +268,8 @@ class TransportMeasurement(ABC):
         for i, x in enumerate(xs):
             if mask[i]:
                 label = Label(labelfloat=x, labelfloatSILabel=silabel)
-                dataCapsules2D.append(Data2D(dataCapsule.yy[:,i], dataCapsule.zz[:,i], label=label))
+                y = dataCapsule.y if dataCapsule.y is not None else dataCapsule.yy[:,i]
+                dataCapsules2D.append(Data2D(y, dataCapsule.zz[:,i], label=label))
 
         return dataCapsules2D
 
@@ -186,7 +292,7 @@ class TransportMeasurement(ABC):
 
     def getIdVdIs(self, sweepType, deviceID=0, sweepRange=None, selection=None):
         """Gets IV curves from the underlying dataset. """
-        dataCapsule = self.sweepIdVdI(sweepType, deviceID=deviceID)
+        dataCapsule = self._cachedSweep(self.sweepIdVdI, sweepType, deviceID=deviceID)
         if isinstance(dataCapsule, RegularData3D):
             return self._getIVRegular(dataCapsule, sweepType, sweepRange = sweepRange, selection = selection)
         elif isinstance(dataCapsule, IrregularData3D):
@@ -196,9 +302,10 @@ class TransportMeasurement(ABC):
 
     def _selectSweepValuesDataCapsule(self, dataCapsule, sweepRange=None, selection=None):
         if isinstance(dataCapsule, RegularData3D):
-            x = dataCapsule.xx[0,:]
+            x = dataCapsule.x
             mask = self._getMaskForX(x, sweepRange=sweepRange, selection=selection)
-            return RegularData3D(dataCapsule.xx[:,mask], dataCapsule.yy[:,mask], dataCapsule.zz[:,mask])
+            y = dataCapsule.y if dataCapsule.y is not None else dataCapsule.yy[:,mask]
+            return RegularData3D(x[mask], y, dataCapsule.zz[:,mask])
         elif isinstance(dataCapsule, IrregularData3D):
             x = dataCapsule.x
             mask = self._getMaskForX(x, sweepRange=sweepRange, selection=selection)
@@ -206,7 +313,8 @@ class TransportMeasurement(ABC):
         elif isinstance(dataCapsule, Data2D):
             x = dataCapsule.x
             mask = self._getMaskForX(x, sweepRange=sweepRange, selection=selection)
-            return Data2D(dataCapsule.x[mask], dataCapsule.y[mask])
+            yerr = dataCapsule.yerr[mask] if dataCapsule.yerr is not None else None
+            return Data2D(dataCapsule.x[mask], dataCapsule.y[mask], yerr=yerr)
         else:
             TypeError("This type of datacapsule does not support masking.")
 
@@ -1,49 +1,69 @@
 from Model.Model import VectorMagnetModel
 from Model.SingleMeasurement import SingleMeasurement
+from Model.SegmentOperations import segmentStatistics, SegmentStatistics
 from DataCapsule.DataCapsules import Data2D
 import numpy as np
 
 class ZILockin(VectorMagnetModel):
-    def __init__(self, paths):
-        super().__init__(paths)
-
-    def loadDataFromFile(self, path):
-        VTITemperature, sampleTemperature, Bx, By, Bz = self.vectorMagnetTemperatureAndField(path)
-        R, Phi = self.loadLockinData(path)
-        singleMeasurementFirstIndices = self.singleMeasurementFirstIndices([VTITemperature, sampleTemperature, Bx, By, Bz])
-
-        for i, start in enumerate(singleMeasurementFirstIndices):
-            if i < len(singleMeasurementFirstIndices) - 1:
-                end = singleMeasurementFirstIndices[i+1]
-            else:
-                end = len(VTITemperature)
-
-            r = R[start:end]
-            phi = Phi[start:end]
-            self._data.append(ZILockinData(VTITemperature[start],
-                                      sampleTemperature[start],
-                                      Bx[start],
-                                      By[start],
-                                      Bz[start],
-                                      r,
-                                      phi))
-
-    def loadLockinData(self, path):
-        rPerDevice, phiPerDevice = self.load2DDataForVectorMagnet(path, "R", "Phi")
-        return rPerDevice[0], phiPerDevice[0]
+    quantities = ("R", "phi")
+    lockinQuantities = ("R", "phi", "X", "Y") # X and Y are derived from R and phi (in degrees)
 
-    def sweepR(self, sweepType, deviceID=0):
-        """Returns (x,R,Rstd) data for some environmental variable x."""
-        x = np.zeros(len(self._data))
-        y = np.zeros_like(x)
-        yerr = np.zeros_like(y)
+    def __init__(self, paths, progressCallback=None, follow=False, useColumnCache=False, loadWorkers=1):
+        super().__init__(paths, progressCallback=progressCallback, follow=follow, useColumnCache=useColumnCache,
+                         loadWorkers=loadWorkers)
+        self._statistics = None
+        self._statisticsVersion = None
+
+    def loadDataFromTable(self, table):
+        environment = self.vectorMagnetTemperatureAndField(table)
+        R, Phi = self.loadLockinData(table)
+        self._data.append(self.singleMeasurementFirstIndices(environment), environment, {"R": R, "phi": Phi})
+
+    def singleMeasurement(self, index):
+        return ZILockinData(*self._data.environmentOf(index),
+                            self._data.segment("R", 0, index),
+                            self._data.segment("phi", 0, index))
+
+    def loadLockinData(self, table):
+        # R and Phi of every demodulator/device
+        return self.load2DDataForVectorMagnet(table, "R", "Phi")
 
-        for i, data in enumerate(self._data):
-            x[i] = data.environmental(sweepType)
-            y[i] = np.mean(data.R)
-            yerr[i] = np.std(data.R)
+    def lockinStatistics(self):
+        """Returns per device a dict from each of lockinQuantities to the SegmentStatistics of that quantity over every
+        single measurement. All quantities of all devices are reduced in one pass, and the result is kept until the
+        data changes."""
+        if self._statistics is not None and self._statisticsVersion == self._data.version:
+            return self._statistics
 
-        return Data2D(x,y)
+        # Before any data is read, device 0 is there, without single measurements:
+        amountOfDevices = max(self._data.amountOfDevices, 1)
+        columns = []
+        for deviceID in range(amountOfDevices):
+            R = self._data.column("R", deviceID)
+            phi = self._data.column("phi", deviceID)
+            columns += [R, phi, R * np.cos(np.radians(phi)), R * np.sin(np.radians(phi))]
+        statistics = segmentStatistics(np.column_stack(columns), self._data.offsets)
+
+        self._statistics = []
+        for deviceID in range(amountOfDevices):
+            perQuantity = {}
+            for i, quantity in enumerate(self.lockinQuantities):
+                column = deviceID * len(self.lockinQuantities) + i
+                perQuantity[quantity] = SegmentStatistics(*(statistic[:, column] for statistic in statistics))
+            self._statistics.append(perQuantity)
+        self._statisticsVersion = self._data.version
+        return self._statistics
+
+    def sweepLockin(self, quantity, sweepType, deviceID=0, median=False):
+        """Returns (x, mean or median, std) of a lockin quantity ("R", "phi", "X" or "Y") for some environmental
+        variable x, with the standard deviation within every single measurement as y-error."""
+        statistics = self.lockinStatistics()[deviceID][quantity]
+        y = statistics.median if median else statistics.mean
+        return Data2D(self._data.environmental(sweepType).copy(), y, yerr=statistics.std)
+
+    def sweepR(self, sweepType, deviceID=0):
+        """Returns (x,R,Rstd) data for some environmental variable x."""
+        return self.sweepLockin("R", sweepType, deviceID=deviceID)
 
 
 class ZILockinData(SingleMeasurement):
@@ -54,4 +74,4 @@ class ZILockinData(SingleMeasurement):
         self.By = float(By)
         self.Bz = float(Bz)
         self.R = R
-        self.phi = phi
\ No newline at end of file
+        self.phi = phi
@@ -17,4 +17,11 @@ contourLinewidths = .4 # Not overrideable
 baxpad = .2
 majorTickSize = [1.6,8]
 minorTickSize = [.8,4]
-amountOfZTicks = 6
\ No newline at end of file
+amountOfZTicks = 6
+colorplotStyle = 'contour' # 'contour': filled and line contours, 'mesh': pcolormesh
+interpolationResolution = 600 # Grid points per axis when interpolating scattered data for colorplots
+decimationThreshold = 20000 # Curves with more points are decimated to the pixel resolution of their axes
+rasterizeOn = None # Rasterize data artists in vector output: True, False, or None to decide by rasterizeThreshold
+rasterizeThreshold = 5000 # Data artists with more points are rasterized if rasterizeOn is None
+collectCurvesThreshold = 50 # Scatter2D subplots with more curves draw them all as one collection
+errorbarsOn = False # Draw the error bars of Data2Ds that have them
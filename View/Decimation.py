@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def decimationIndices(y, amountOfChunks):
+    """Returns the sorted indices of the points to draw of a curve with many more points than the output can show.
+
+    The curve is cut into amountOfChunks runs of consecutive points, and of every run only the first, last, lowest
+    and highest point are kept. With one run per pixel column, the drawn line covers the same pixels as the full one:
+    peaks and switching edges are kept, and the order of the points is preserved, so up-and-down sweeps are not mixed.
+    NaN points are skipped."""
+    y = np.asarray(y, dtype=float)
+    amount = len(y)
+    chunkSize = int(np.ceil(amount / max(amountOfChunks, 1)))
+    if chunkSize <= 4:
+        return np.arange(amount)
+
+    starts = np.arange(0, amount, chunkSize)
+    ends = np.minimum(starts + chunkSize, amount) - 1
+
+    # Pad to whole chunks, so that every chunk is a row of a 2D array:
+    padded = np.full(len(starts) * chunkSize, np.nan)
+    padded[:amount] = y
+    padded = padded.reshape(-1, chunkSize)
+    valid = ~np.isnan(padded)
+    hasValid = valid.any(axis=1)
+
+    lowest = starts + np.argmin(np.where(valid, padded, np.inf), axis=1)
+    highest = starts + np.argmax(np.where(valid, padded, -np.inf), axis=1)
+
+    return np.unique(np.concatenate((starts, ends, lowest[hasValid], highest[hasValid])))
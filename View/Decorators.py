@@ -9,7 +9,9 @@ class Decorator(object):
                  legendOn=None, legendOutsideBox=None,
                  gridOn=None, minorticksOn = None, brokenYLim = None, baxpad=None,
                  labelPad = None, labelPadZ = None, contourFillLevels = None, contourLevels = None,
-                 semilogy = None, tickspacing = None, tickspacingz = None, majorTickSize = None, minorTickSize = None):
+                 semilogy = None, tickspacing = None, tickspacingz = None, majorTickSize = None, minorTickSize = None,
+                 errorbarsOn = None, colorplotStyle = None, interpolationResolution = None,
+                 decimationOn = None, rasterizeOn = None, collectCurvesOn = None, colorByLabelOn = None):
         self.xlabel = xlabel
         self.ylabel = ylabel
         self.zlabel = zlabel
@@ -43,6 +45,13 @@ class Decorator(object):
         self.tickspacingz = tickspacingz
         self.majorTickSize = majorTickSize  # 2-element list
         self.minorTickSize = minorTickSize  # 2-element list
+        self.errorbarsOn = errorbarsOn
+        self.colorplotStyle = colorplotStyle # 'contour' or 'mesh'
+        self.interpolationResolution = interpolationResolution
+        self.decimationOn = decimationOn # None: decimate curves longer than Defaults.decimationThreshold
+        self.rasterizeOn = rasterizeOn # None: use Defaults.rasterizeOn
+        self.collectCurvesOn = collectCurvesOn # None: collect subplots with more than Defaults.collectCurvesThreshold curves
+        self.colorByLabelOn = colorByLabelOn # None: color collected curves by labelfloat if they all have one
 
     def overrideDecorator(self, override):
         if override.xlabel is not None:
@@ -111,6 +120,20 @@ class Decorator(object):
             self.majorTickSize = majorTickSize
         if override.minorTickSize is not None:
             self.minorTickSize = minorTickSize
+        if override.errorbarsOn is not None:
+            self.errorbarsOn = override.errorbarsOn
+        if override.colorplotStyle is not None:
+            self.colorplotStyle = override.colorplotStyle
+        if override.interpolationResolution is not None:
+            self.interpolationResolution = override.interpolationResolution
+        if override.decimationOn is not None:
+            self.decimationOn = override.decimationOn
+        if override.rasterizeOn is not None:
+            self.rasterizeOn = override.rasterizeOn
+        if override.collectCurvesOn is not None:
+            self.collectCurvesOn = override.collectCurvesOn
+        if override.colorByLabelOn is not None:
+            self.colorByLabelOn = override.colorByLabelOn
 
 class Decorators(Enum):
     SQI_IV = Decorator(xlabel = SILabel(PlotUnits.InPlaneAppliedMagneticField, PlotScales.Milli),
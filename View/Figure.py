@@ -1,16 +1,24 @@
 from typing import NamedTuple
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure as MatplotlibFigure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 from matplotlib.gridspec import GridSpec
 
 class Figure():
     def __init__(self, nrows, ncols, dpi, figsize, sharex, sharey, bax, colorplot,
-                 colorbarwidth=.05, figurepadding=0.2):
+                 colorbarwidth=.05, figurepadding=0.2, headless=False):
         """Sharex: list of tuples of linked positions.
            Sharey: list of tuples of linked positions.
            Bax: list of positions with broken axes
-           Colorplot: list of positions with colorplots"""
-        self.figure = plt.figure(figsize=figsize, dpi=dpi)
+           Colorplot: list of positions with colorplots
+           Headless: render with the non-interactive Agg canvas, outside of pyplot, so that the figure is freed as soon
+           as it is no longer referenced"""
+        if headless:
+            self.figure = MatplotlibFigure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(self.figure)
+        else:
+            self.figure = plt.figure(figsize=figsize, dpi=dpi)
         width_ratios, height_ratios = self._generateWidthHeightRatios(nrows, ncols, colorbarwidth, figurepadding)
         print(width_ratios, height_ratios)
 
@@ -0,0 +1,65 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import Delaunay
+
+
+class GridInterpolator():
+    """Linear interpolation of scattered (x, y) points onto a regular grid, like scipy.interpolate.griddata with
+    method='linear'. The Delaunay triangulation of the points and the barycentric weights of every grid point are
+    computed once, so interpolating another z-quantity over the same points (e.g. the IV and dV/dI maps of one sweep)
+    is a single weighted sum."""
+    def __init__(self, x, y, resolution):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        xax = np.linspace(np.min(x) + 1e-12, np.max(x) - 1e-12, resolution)
+        yax = np.linspace(np.min(y) + 1e-12, np.max(y) - 1e-12, resolution)
+        self.grid_x, self.grid_y = np.meshgrid(xax, yax)
+
+        triangulation = Delaunay(np.column_stack((x, y)))
+        gridPoints = np.column_stack((self.grid_x.ravel(), self.grid_y.ravel()))
+        simplices = triangulation.find_simplex(gridPoints)
+        self.inside = simplices >= 0
+
+        # Barycentric coordinates of every grid point inside the convex hull of the points:
+        transform = triangulation.transform[simplices[self.inside]]
+        partial = np.einsum('nij,nj->ni', transform[:, :2], gridPoints[self.inside] - transform[:, 2])
+        self.weights = np.column_stack((partial, 1 - partial.sum(axis=1)))
+        self.vertices = triangulation.simplices[simplices[self.inside]]
+
+    def __call__(self, z):
+        """Returns z interpolated on the grid, NaN outside the convex hull of the points."""
+        z = np.asarray(z, dtype=float)
+        grid_z = np.full(self.grid_x.size, np.nan)
+        grid_z[self.inside] = np.einsum('nj,nj->n', z[self.vertices], self.weights)
+        return grid_z.reshape(self.grid_x.shape)
+
+
+_cacheSize = 4 # Every interpolator holds a few arrays of resolution**2 elements
+_cache = OrderedDict()
+
+
+def gridInterpolator(x, y, resolution):
+    """Returns the GridInterpolator for the point set (x, y), reusing a cached one if the same points were
+    interpolated at the same resolution before."""
+    x = np.ascontiguousarray(x, dtype=float)
+    y = np.ascontiguousarray(y, dtype=float)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(x.tobytes())
+    digest.update(y.tobytes())
+    key = (digest.hexdigest(), len(x), resolution)
+
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    interpolator = GridInterpolator(x, y, resolution)
+    _cache[key] = interpolator
+    while len(_cache) > _cacheSize:
+        _cache.popitem(last=False)
+    return interpolator
+
+
+def clearInterpolatorCache():
+    _cache.clear()
@@ -1,14 +1,19 @@
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import matplotlib.ticker as ticker
+from matplotlib.cm import ScalarMappable
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize, to_rgba_array
 
 import numpy as np
 
 from abc import ABC, abstractmethod
+from typing import NamedTuple
 
 from DataCapsule.DataCapsules import RegularData3D, IrregularData3D, Data2D, SmoothFunction2D
 
-from scipy.interpolate import griddata
+from View.Interpolation import gridInterpolator
+from View.Decimation import decimationIndices
 
 import Module.Defaults as Defaults
 
@@ -26,7 +31,7 @@ class Plotter(ABC):
         self.fitcolors = self.decorator.fitcolors if self.decorator.fitcolors is not None else Defaults.fitColors
         self.linecolorindex = 0
         self.fitcolorindex = 0
-        pass
+        self.artists = [] # Per plotted data capsule, the list of matplotlib artists drawn for it
 
     def _linecolor(self):
         if self.linecolorindex == len(self.linecolors):
@@ -43,12 +48,51 @@ class Plotter(ABC):
         return color
 
     def addColorbar(self, im, cax, ticks=None, toRemove=False):
-        self.colorbar = plt.colorbar(im, cax=cax, ticks=ticks)
+        self.colorbar = cax.figure.colorbar(im, cax=cax, ticks=ticks)
 
     @abstractmethod
     def plotDataCapsule(self, ax, dataCapsule, cax=None, bax=None):
+        # Plots a data capsule and appends the artists drawn for it to self.artists
         pass
 
+    def plotDataCapsules(self, ax, dataCapsules, cax=None, bax=None):
+        # Plots all data capsules of a subplot
+        for dataCapsule in dataCapsules:
+            self.plotDataCapsule(ax, dataCapsule, cax=cax, bax=bax)
+
+    def clearArtists(self):
+        # Forgets all artists drawn so far, e.g. before drawing on a new figure
+        self.artists = []
+        self.im = None
+        self.colorbar = None
+
+    def updateDataCapsule(self, index, ax, dataCapsule, cax=None, bax=None):
+        """Replaces the artists of the index-th plotted data capsule by those of a new data capsule. Here they are
+        removed and drawn again; plotters that can update their artists in place override this."""
+        self._removeArtists(self.artists[index])
+        self.plotDataCapsule(ax, dataCapsule, cax=cax, bax=bax)
+        self.artists[index] = self.artists.pop()
+
+    def refresh(self, ax, cax=None, bax=None):
+        # Adapts the axes to changed data; limits fixed by the decorator are kept
+        for axis in [ax, bax]:
+            if axis is not None:
+                axis.relim()
+                axis.autoscale_view()
+
+    def _removeArtists(self, artists):
+        for artist in artists:
+            artist.remove()
+
+    def _rasterize(self, amountOfPoints):
+        """Whether data artists with this many points are rasterized (at the figure dpi) in vector output, while axes,
+        ticks and labels stay vectors. Decided by the decorator's rasterizeOn, else the global Defaults.rasterizeOn;
+        if both are None, artists with more than Defaults.rasterizeThreshold points are rasterized."""
+        rasterizeOn = self.decorator.rasterizeOn if self.decorator.rasterizeOn is not None else Defaults.rasterizeOn
+        if rasterizeOn is None:
+            return amountOfPoints > Defaults.rasterizeThreshold
+        return rasterizeOn == True
+
     def decorate(self, ax, cax=None, bax=None, secondaryAxis=False):
         labelpadx = self.decorator.labelPad[0] if self.decorator.labelPad is not None else Defaults.labelPadX
         labelpady = self.decorator.labelPad[1] if self.decorator.labelPad is not None else Defaults.labelPadY
@@ -127,6 +171,8 @@ class ColorPlotter(Plotter):
         self.contourFillLevels = self.decorator.contourFillLevels if self.decorator.contourFillLevels is not None else Defaults.contourFillLevels
         self.contourLevels = self.decorator.contourLevels if self.decorator.contourLevels is not None else Defaults.contourLevels
         self.contourLinewidths = Defaults.contourLinewidths # Magic number
+        self.colorplotStyle = self.decorator.colorplotStyle if self.decorator.colorplotStyle is not None else Defaults.colorplotStyle
+        self.interpolationResolution = self.decorator.interpolationResolution if self.decorator.interpolationResolution is not None else Defaults.interpolationResolution
 
     def plotDataCapsule(self, ax, dataCapsule, cax=None, bax=None):
         if isinstance(dataCapsule, RegularData3D):
@@ -138,18 +184,25 @@ class ColorPlotter(Plotter):
 
     def plotRegularData3D(self, ax, regularData3D, cax, bax):
         vmin, vmax = self.getZrange(regularData3D)
+        zz = np.asarray(regularData3D.zz, dtype=float)
+        if regularData3D.y is not None:
+            # Drawn from the axes, without grids:
+            xx = np.asarray(regularData3D.x, dtype=float)
+            yy = np.asarray(regularData3D.y, dtype=float)
+            monotonic = self._isMonotonicAxis(xx) and self._isMonotonicAxis(yy)
+        else:
+            xx = np.asarray(regularData3D.xx, dtype=float)
+            yy = np.asarray(regularData3D.yy, dtype=float)
+            monotonic = self._isMonotonicGrid(xx, yy)
 
-        """
-        im = ax.pcolormesh(regularData3D.xx / self.decorator.xlabel.scale,
-                           regularData3D.yy / self.decorator.ylabel.scale,
-                           regularData3D.zz / self.decorator.zlabel.scale,
-                           shading = 'nearest', cmap=self.cmap, vmin=vmin, vmax=vmax)
-        """
-
-        xdata = regularData3D.xx.flatten()
-        ydata = regularData3D.yy.flatten()
-        zdata = regularData3D.zz.flatten()
-        self._countourPlot(xdata, ydata, zdata, vmin, vmax, ax, cax)
+        if monotonic:
+            # Already on a grid, so it is drawn directly without interpolation:
+            self.artists.append(self._gridPlot(xx, yy, zz, vmin, vmax, ax, cax))
+        else:
+            # E.g. up-and-down current sweeps, whose grid folds onto itself:
+            xlist = np.asarray(regularData3D.xx, dtype=float).flatten()
+            ylist = np.asarray(regularData3D.yy, dtype=float).flatten()
+            self.artists.append(self._countourPlot(xlist, ylist, zz.flatten(), vmin, vmax, ax, cax))
 
         if bax is not None:
             print("Warning: currently broken axes for colorplots are not supported.")
@@ -161,60 +214,84 @@ class ColorPlotter(Plotter):
             axis=0)
         ylist = np.concatenate(irregularData3D.ylist, axis=0)
         zlist = np.concatenate(irregularData3D.zlist, axis=0)
-        self._countourPlot(xlist, ylist, zlist, vmin, vmax, ax, cax)
-        """
-        im = ax.tricontourf(grid_x.flatten() / self.decorator.xlabel.scale,
-                         grid_y.flatten() / self.decorator.ylabel.scale,
-                         grid_z.flatten() / self.decorator.zlabel.scale, levels=levelsf, cmap=self.cmap,
-                         extend='both')
-        self.addColorbar(im, cax, ticks=np.linspace(vmin, vmax, 6))
-        ax.contour(grid_x / self.decorator.xlabel.scale,
-                   grid_y / self.decorator.ylabel.scale,
-                   grid_z / self.decorator.zlabel.scale, linewidths=self.contourLinewidths, levels=levels,
-                   colors='k', alpha=.4)
-        """
+        self.artists.append(self._countourPlot(xlist, ylist, zlist, vmin, vmax, ax, cax))
+
         if bax is not None:
             print("Warning: currently broken axes for colorplots are not supported.")
 
+    def _isMonotonicGrid(self, xx, yy):
+        """True if x strictly increases or decreases along every row and y along every column, so that the grid can be
+        drawn as it is."""
+        if xx.ndim != 2 or xx.shape != yy.shape or min(xx.shape) < 2:
+            return False
+        dx = np.diff(xx, axis=1)
+        dy = np.diff(yy, axis=0)
+        return bool((np.all(dx > 0) or np.all(dx < 0)) and (np.all(dy > 0) or np.all(dy < 0)))
+
+    def _isMonotonicAxis(self, axis):
+        d = np.diff(axis)
+        return len(axis) >= 2 and bool(np.all(d > 0) or np.all(d < 0))
+
     def _countourPlot(self, xlist, ylist, zlist, vmin, vmax, ax, cax):
-        xax = np.linspace(np.min(xlist) + 1e-12, np.max(xlist) - 1e-12, 600)
-        yax = np.linspace(np.min(ylist) + 1e-12, np.max(ylist) - 1e-12, 600)
-        grid_x, grid_y = np.meshgrid(xax, yax)
-        grid_z = griddata((xlist, ylist), zlist, (grid_x, grid_y), method='linear')
+        # Interpolates the scattered points onto a regular grid once, shared by the filled and line contours. The
+        # triangulation is cached, so maps of other quantities over the same points skip it:
+        interpolator = gridInterpolator(xlist, ylist, self.interpolationResolution)
+        grid_z = interpolator(zlist)
+
+        return self._gridPlot(interpolator.grid_x, interpolator.grid_y, grid_z, vmin, vmax, ax, cax)
+
+    def _gridPlot(self, grid_x, grid_y, grid_z, vmin, vmax, ax, cax):
+        grid_x = grid_x / self.decorator.xlabel.scale
+        grid_y = grid_y / self.decorator.ylabel.scale
+        grid_z = grid_z / self.decorator.zlabel.scale
+
+        tickspacing = self.decorator.tickspacingz if self.decorator.tickspacingz is not None else (vmax - vmin) / (
+                    Defaults.amountOfZTicks - 1)
+
+        rasterized = self._rasterize(np.size(grid_z))
+
+        if self.colorplotStyle == 'mesh':
+            im = ax.pcolormesh(grid_x, grid_y, grid_z, shading='nearest', cmap=self.cmap, vmin=vmin, vmax=vmax,
+                               rasterized=rasterized)
+            self.addColorbar(im, cax, ticks=np.arange(vmin, vmax + tickspacing, tickspacing))
+            return [im]
 
         levelsf = np.linspace(vmin, vmax, self.contourFillLevels + 2, endpoint=False)[1:]
         levels = np.linspace(vmin, vmax, self.contourLevels + 2, endpoint=False)[1:]
 
-        im = ax.contourf(grid_x / self.decorator.xlabel.scale,
-                         grid_y / self.decorator.ylabel.scale,
-                         grid_z / self.decorator.zlabel.scale, levels=levelsf, cmap=self.cmap,
-                         extend='both')
+        im = ax.contourf(grid_x, grid_y, grid_z, levels=levelsf, cmap=self.cmap, extend='both')
 
         for c in im.collections:
             c.set_edgecolor("face")
+            c.set_rasterized(rasterized)
 
-        tickspacing = self.decorator.tickspacingz if self.decorator.tickspacingz is not None else (vmax - vmin) / (
-                    Defaults.amountOfZTicks - 1)
         self.addColorbar(im, cax, ticks=np.arange(vmin, vmax + tickspacing, tickspacing))
 
-        xax = np.linspace(np.min(xlist) + 1e-12, np.max(xlist) - 1e-12, 600)
-        yax = np.linspace(np.min(ylist) + 1e-12, np.max(ylist) - 1e-12, 600)
-        grid_x, grid_y = np.meshgrid(xax, yax)
-        grid_z = griddata((xlist, ylist), zlist, (grid_x, grid_y), method='linear')
+        lines = ax.contour(grid_x, grid_y, grid_z, linewidths=self.contourLinewidths, levels=levels,
+                           colors='k', alpha=.4)
 
-        ax.contour(grid_x / self.decorator.xlabel.scale,
-                   grid_y / self.decorator.ylabel.scale,
-                   grid_z / self.decorator.zlabel.scale, linewidths=self.contourLinewidths, levels=levels,
-                   colors='k', alpha=.4)
+        return [im, lines]
+
+    def updateDataCapsule(self, index, ax, dataCapsule, cax=None, bax=None):
+        # Contour sets cannot be changed in place, so they are drawn again, along with the colorbar:
+        if cax is not None:
+            cax.clear()
+        super().updateDataCapsule(index, ax, dataCapsule, cax=cax, bax=bax)
+
+    def refresh(self, ax, cax=None, bax=None):
+        # Restores the colorbar title after the colorbar was drawn again:
+        super().refresh(ax, cax=cax, bax=bax)
+        self.decorate(ax, cax=cax, bax=bax)
 
     def getZrange(self, data3D):
+        # NaNs, e.g. masked points of resampled data, are ignored:
         if isinstance(data3D, RegularData3D):
-            datamin = np.min(data3D.zz)
-            datamax = np.max(data3D.zz)
+            datamin = np.nanmin(data3D.zz)
+            datamax = np.nanmax(data3D.zz)
 
         elif isinstance(data3D, IrregularData3D):
-            datamin = np.min([np.min(data3D.zlist[i]) for i in range(len(data3D.zlist))])
-            datamax = np.max([np.max(data3D.zlist[i]) for i in range(len(data3D.zlist))])
+            datamin = np.nanmin([np.nanmin(data3D.zlist[i]) for i in range(len(data3D.zlist))])
+            datamax = np.nanmax([np.nanmax(data3D.zlist[i]) for i in range(len(data3D.zlist))])
         else:
             raise TypeError("Dataset type not recognized.")
 
@@ -225,68 +302,313 @@ class ColorPlotter(Plotter):
 class Scatter2D(Plotter):
     def __init__(self, decorator):
         super().__init__(decorator)
+        self.cmap = self.decorator.cmap if self.decorator.cmap is not None else Defaults.cmap
+        self.clearArtists()
+
+    def clearArtists(self):
+        super().clearArtists()
+        self.collectedCurves = None # If the curves are collected: the collected Data2Ds by their index in self.artists
+        self.collections = [] # CurveCollections, one per axis
+        self.colorByLabel = False
+        self.labelNorm = None
+        self.legendColorbar = None
 
     def _plotData2DToAxis(self, ax, dataCapsule, color, toIm=True):
         label = dataCapsule.label
+        x, y, yerr = self._scaledData2D(ax, dataCapsule)
+
+        rasterized = self._rasterize(len(x))
 
+        scatter = ax.scatter(x, y, s=self.markersize, color=color, label=self.labelText(label), rasterized=rasterized)
         if toIm:
-            self.im = ax.scatter(dataCapsule.x / self.decorator.xlabel.scale,
-                                 dataCapsule.y / self.decorator.ylabel.scale,
-                                 s=self.markersize, color=color, label=self.labelText(label))
-        else:
-            ax.scatter(dataCapsule.x / self.decorator.xlabel.scale,
-                       dataCapsule.y / self.decorator.ylabel.scale,
-                       s=self.markersize, color=color, label=self.labelText(label))
+            self.im = scatter
 
+        line = None
         if (self.decorator.connectDots is None) or (self.decorator.connectDots == True):
-            ax.plot(dataCapsule.x / self.decorator.xlabel.scale, dataCapsule.y / self.decorator.ylabel.scale,
-                    linewidth=self.linewidth, linestyle=self.linestyle, color=color)
+            line, = ax.plot(x, y, linewidth=self.linewidth, linestyle=self.linestyle, color=color,
+                            rasterized=rasterized)
 
-    def _plotSmoothFunction2DToAxis(self, ax, dataCapsule, toIm=True):
+        errorbar = None
+        if yerr is not None:
+            errorbar = ax.errorbar(x, y, yerr=yerr, fmt='none', ecolor=color, elinewidth=self.linewidth)
+            errorbar.lines[2][0].set_rasterized(rasterized)
+
+        return Data2DArtists(scatter=scatter, line=line, errorbar=errorbar)
+
+    def _plotSmoothFunction2DToAxis(self, ax, dataCapsule, color, toIm=True):
         label = dataCapsule.label
 
-        x0, x1 = ax.get_xlim()
+        x0, x1 = self._functionRange(ax)
         xax = np.linspace(x0, x1, dataCapsule.NPoints)
+        lines = ax.plot(xax,
+                        dataCapsule.func(xax * self.decorator.xlabel.scale) / self.decorator.ylabel.scale,
+                        linewidth=self.linewidth, linestyle='--', label=self.labelText(label),
+                        color=color)
         if toIm:
-            self.im = ax.plot(xax,
-                              dataCapsule.func(xax * self.decorator.xlabel.scale) / self.decorator.ylabel.scale,
-                              linewidth=self.linewidth, linestyle='--', label=self.labelText(label),
-                              color=self._fitcolor())
-        else:
-            ax.plot(xax,
-                    dataCapsule.func(xax * self.decorator.xlabel.scale) / self.decorator.ylabel.scale,
-                    linewidth=self.linewidth, linestyle='--', label=self.labelText(label),
-                    color=self._fitcolor())
+            self.im = lines
+        return lines[0]
+
+    def _functionRange(self, ax):
+        # Smooth functions span the x-limits set by the decorator, or else the data drawn so far
+        if self.decorator.xlim is not None:
+            return self.decorator.xlim
+        return ax.get_xlim()
+
+    def _showErrorbars(self, dataCapsule):
+        errorbarsOn = self.decorator.errorbarsOn if self.decorator.errorbarsOn is not None else Defaults.errorbarsOn
+        return dataCapsule.yerr is not None and errorbarsOn == True
+
+    def _scaledData2D(self, ax, dataCapsule):
+        """Returns x, y and yerr (None if no error bars are shown) in plot units. Curves with more points than the
+        axes have pixel columns are decimated, keeping peaks and edges (see decimationIndices)."""
+        x = np.asarray(dataCapsule.x) / self.decorator.xlabel.scale
+        y = np.asarray(dataCapsule.y) / self.decorator.ylabel.scale
+        yerr = np.asarray(dataCapsule.yerr) / self.decorator.ylabel.scale if self._showErrorbars(dataCapsule) else None
+
+        if self.decorator.decimationOn == True or (self.decorator.decimationOn is None and
+                                                   len(x) > Defaults.decimationThreshold):
+            indices = decimationIndices(y, max(int(ax.bbox.width), 1))
+            x, y = x[indices], y[indices]
+            if yerr is not None:
+                yerr = yerr[indices]
+
+        return x, y, yerr
+
+    def plotDataCapsules(self, ax, dataCapsules, cax=None, bax=None):
+        """Subplots with many curves (see _collectCurves) draw all their Data2Ds as one LineCollection and one
+        PathCollection per axis, instead of two artists per curve; fits are drawn as usual."""
+        if not self._collectCurves(dataCapsules):
+            super().plotDataCapsules(ax, dataCapsules, cax=cax, bax=bax)
+            return
+
+        self.collectedCurves = {}
+        for axis in [ax, bax]:
+            if axis is not None:
+                self.collections.append(self._addCurveCollection(axis))
+
+        for dataCapsule in dataCapsules:
+            if isinstance(dataCapsule, Data2D):
+                self.collectedCurves[len(self.artists)] = dataCapsule
+            self.artists.append([])
+        self._drawCollectedCurves()
+
+        # Fits last, so that they span the limits of the curves:
+        for index, dataCapsule in enumerate(dataCapsules):
+            if index not in self.collectedCurves:
+                self.plotDataCapsule(ax, dataCapsule, cax=cax, bax=bax)
+                self.artists[index] = self.artists.pop()
+
+    def _collectCurves(self, dataCapsules):
+        if self.decorator.collectCurvesOn is None:
+            amountOfCurves = sum(isinstance(dataCapsule, Data2D) for dataCapsule in dataCapsules)
+            return amountOfCurves > Defaults.collectCurvesThreshold
+        return self.decorator.collectCurvesOn == True
+
+    def _addCurveCollection(self, ax):
+        lines = None
+        if (self.decorator.connectDots is None) or (self.decorator.connectDots == True):
+            lines = LineCollection([], linewidths=self.linewidth, linestyles=self.linestyle)
+            ax.add_collection(lines, autolim=False)
+        points = ax.scatter([], [], s=self.markersize)
+        errorbars = LineCollection([], linewidths=self.linewidth)
+        ax.add_collection(errorbars, autolim=False)
+        self.im = points
+        return CurveCollection(axis=ax, lines=lines, points=points, errorbars=errorbars)
+
+    def _drawCollectedCurves(self):
+        # Sets the collections to the data of all collected curves
+        curves = [self.collectedCurves[index] for index in sorted(self.collectedCurves)]
+        colors = self._collectedColors(curves)
+        if not self.colorByLabel and self.legendColorbar is not None:
+            # The colors fell back to the linecolors cycle, which the colorbar legend does not describe:
+            self.legendColorbar.ax.remove()
+            self.legendColorbar = None
+
+        for collection in self.collections:
+            scaled = [self._scaledData2D(collection.axis, curve) for curve in curves]
+            lengths = [len(x) for x, y, yerr in scaled]
+            rasterized = self._rasterize(sum(lengths))
+
+            points = [np.column_stack((x, y)) for x, y, yerr in scaled]
+            collection.points.set_offsets(np.concatenate(points) if points else np.empty((0, 2)))
+            collection.points.set_color(np.repeat(colors, lengths, axis=0))
+            collection.points.set_rasterized(rasterized)
+
+            if collection.lines is not None:
+                collection.lines.set_segments(points)
+                collection.lines.set_color(colors)
+                collection.lines.set_rasterized(rasterized)
+
+            errorbars = [np.stack((np.column_stack((x, y - yerr)), np.column_stack((x, y + yerr))), axis=1)
+                         for x, y, yerr in scaled if yerr is not None]
+            errorbarColors = [np.repeat(color[np.newaxis], length, axis=0)
+                              for color, length, (x, y, yerr) in zip(colors, lengths, scaled) if yerr is not None]
+            collection.errorbars.set_segments(np.concatenate(errorbars) if errorbars else [])
+            collection.errorbars.set_color(np.concatenate(errorbarColors) if errorbarColors else 'none')
+            collection.errorbars.set_rasterized(rasterized)
+
+            self._collectedDataLim(collection)
+            collection.axis.autoscale_view()
+
+    def _collectedColors(self, curves):
+        """RGBA colors of the collected curves: by the decorator's colorByLabelOn (None: if all curves have a labelfloat)
+        from the colormap keyed to labelfloat, else from the linecolors cycle."""
+        hasLabels = len(curves) > 0 and all(curve.label is not None and curve.label.labelfloat is not None
+                                            for curve in curves)
+        self.colorByLabel = hasLabels and (self.decorator.colorByLabelOn is None or self.decorator.colorByLabelOn == True)
+        if self.colorByLabel:
+            values = np.array([curve.label.labelfloat for curve in curves]) / self._labelSILabel(curves).scale
+            self.labelNorm = Normalize(vmin=np.min(values), vmax=np.max(values))
+            return plt.get_cmap(self.cmap)(self.labelNorm(values))
+        return to_rgba_array([self.linecolors[i % len(self.linecolors)] for i in range(len(curves))])
+
+    def _labelSILabel(self, curves):
+        label = curves[0].label
+        return label.labelfloatSILabel if label.labelfloatSILabel is not None else self.decorator.ylabel
+
+    def _collectedDataLim(self, collection):
+        # Axes.relim and the collections themselves do not track the data limits of collections
+        collection.axis.update_datalim(collection.points.get_offsets())
+        for segment in collection.errorbars.get_segments():
+            collection.axis.update_datalim(segment)
 
     def plotDataCapsule(self, ax, dataCapsule, cax=None, bax=None):
+        if self.collectedCurves is not None and isinstance(dataCapsule, Data2D):
+            self.collectedCurves[len(self.artists)] = dataCapsule
+            self.artists.append([])
+            self._drawCollectedCurves()
+            return
+
         if isinstance(dataCapsule, Data2D):
             color = self._linecolor()
-            self._plotData2DToAxis(ax, dataCapsule, color, toIm=True)
+            artists = [self._plotData2DToAxis(ax, dataCapsule, color, toIm=True)]
             if bax is not None:
-                self._plotData2DToAxis(bax, dataCapsule, color, toIm=False)
-
+                artists.append(self._plotData2DToAxis(bax, dataCapsule, color, toIm=False))
 
         elif isinstance(dataCapsule, SmoothFunction2D):
-            self._plotSmoothFunction2DToAxis(ax, dataCapsule, toIm=True)
+            color = self._fitcolor()
+            artists = [self._plotSmoothFunction2DToAxis(ax, dataCapsule, color, toIm=True)]
             if bax is not None:
-                self._plotSmoothFunction2DToAxis(bax, dataCapsule, color, toIm=False)
+                artists.append(self._plotSmoothFunction2DToAxis(bax, dataCapsule, color, toIm=False))
         else:
             raise TypeError("Un-supported data capsule type for Scatter2D.")
 
+        self.artists.append(artists)
+
         if cax is not None:
             print("Warning: currently colorbars for scatterplots are not supported.")
 
-    def decorate(self, ax, cax=None, bax=None, baxpad=None):
-        """Bax is the broken axis if using broken axes."""
-        super().decorate(ax)
-        if bax is not None:
-            super().decorate(bax, secondaryAxis=True)
+    def updateDataCapsule(self, index, ax, dataCapsule, cax=None, bax=None):
+        """Moves the points and lines already drawn to the data of the new data capsule. Artists are only drawn again
+        if the new data capsule needs different ones (another type, or error bars appearing or disappearing)."""
+        if self.collectedCurves is not None and (index in self.collectedCurves or isinstance(dataCapsule, Data2D)):
+            self._removeArtists(self.artists[index])
+            self.artists[index] = []
+            self.collectedCurves.pop(index, None)
+            if isinstance(dataCapsule, Data2D):
+                self.collectedCurves[index] = dataCapsule
+            else:
+                self.plotDataCapsule(ax, dataCapsule, cax=cax, bax=bax)
+                self.artists[index] = self.artists.pop()
+            self._drawCollectedCurves()
+            return
+
+        artists = self.artists[index]
+        axes = [ax] if bax is None else [ax, bax]
+
+        if isinstance(dataCapsule, Data2D) and all(isinstance(axisArtists, Data2DArtists) and
+                                                   (axisArtists.errorbar is not None) == self._showErrorbars(dataCapsule)
+                                                   for axisArtists in artists):
+            for axisArtists in artists:
+                x, y, yerr = self._scaledData2D(axisArtists.scatter.axes, dataCapsule)
+                rasterized = self._rasterize(len(x))
+                axisArtists.scatter.set_offsets(np.column_stack((x, y)))
+                axisArtists.scatter.set_label(self.labelText(dataCapsule.label))
+                axisArtists.scatter.set_rasterized(rasterized)
+                if axisArtists.line is not None:
+                    axisArtists.line.set_data(x, y)
+                    axisArtists.line.set_rasterized(rasterized)
+                if axisArtists.errorbar is not None:
+                    segments = np.stack((np.column_stack((x, y - yerr)), np.column_stack((x, y + yerr))), axis=1)
+                    axisArtists.errorbar.lines[2][0].set_segments(segments)
+                    axisArtists.errorbar.lines[2][0].set_rasterized(rasterized)
+
+        elif isinstance(dataCapsule, SmoothFunction2D) and not any(isinstance(axisArtists, Data2DArtists)
+                                                                   for axisArtists in artists):
+            for axis, line in zip(axes, artists):
+                x0, x1 = self._functionRange(axis)
+                xax = np.linspace(x0, x1, dataCapsule.NPoints)
+                line.set_data(xax, dataCapsule.func(xax * self.decorator.xlabel.scale) / self.decorator.ylabel.scale)
+                line.set_label(self.labelText(dataCapsule.label))
+
+        else:
+            super().updateDataCapsule(index, ax, dataCapsule, cax=cax, bax=bax)
+
+    def refresh(self, ax, cax=None, bax=None):
+        # Axes.relim ignores collections, so the scattered points are added to the data limits explicitly:
+        for axis in [ax, bax]:
+            if axis is None:
+                continue
+            axis.relim()
+            for artists in self.artists:
+                for axisArtists in artists:
+                    if isinstance(axisArtists, Data2DArtists) and axisArtists.scatter.axes is axis:
+                        axis.update_datalim(axisArtists.scatter.get_offsets())
+            for collection in self.collections:
+                if collection.axis is axis:
+                    self._collectedDataLim(collection)
+            axis.autoscale_view()
+
+        self._legend(ax)
+
+    def _removeArtists(self, artists):
+        for axisArtists in artists:
+            if isinstance(axisArtists, Data2DArtists):
+                for artist in axisArtists:
+                    if artist is not None:
+                        artist.remove()
+            else:
+                axisArtists.remove()
 
+    def _legend(self, ax):
         if self.decorator.legendOn is None or self.decorator.legendOn == True:
+            if self.collectedCurves is not None:
+                self._collectedLegend(ax)
+                if not any(self.artists): # Only collected curves, which have no legend entries
+                    return
             if self.decorator.legendOutsideBox is None or self.decorator.legendOutsideBox == True:
                 ax.legend(loc='upper left', bbox_to_anchor=[1.05,1])
             else:
                 ax.legend(loc='upper right')
+
+    def _collectedLegend(self, ax):
+        # Curves colored by labelfloat get a small colorbar as legend, below the legend of the other artists
+        if not self.colorByLabel:
+            return
+        if self.legendColorbar is not None:
+            self.legendColorbar.mappable.set_norm(self.labelNorm)
+            self.legendColorbar.update_normal(self.legendColorbar.mappable)
+            return
+
+        if self.decorator.legendOutsideBox is None or self.decorator.legendOutsideBox == True:
+            legendAx = ax.inset_axes([1.05, 0, .03, .5])
+        else:
+            legendAx = ax.inset_axes([.92, .05, .03, .4])
+        self.legendColorbar = ax.figure.colorbar(ScalarMappable(norm=self.labelNorm, cmap=self.cmap), cax=legendAx)
+
+        silabel = self._labelSILabel([self.collectedCurves[index] for index in sorted(self.collectedCurves)])
+        if plt.rcParams['text.usetex']:
+            self.legendColorbar.ax.set_title(silabel.generateLaTeXLabel(), fontsize='small')
+        else:
+            self.legendColorbar.ax.set_title(silabel.generateTextLabel(), fontsize='small')
+
+    def decorate(self, ax, cax=None, bax=None, baxpad=None):
+        """Bax is the broken axis if using broken axes."""
+        super().decorate(ax)
+        if bax is not None:
+            super().decorate(bax, secondaryAxis=True)
+
+        self._legend(ax)
         if self.decorator.gridOn is None or self.decorator.gridOn == True:
             ax.grid()
             if bax is not None:
@@ -377,7 +699,7 @@ class Scatter2D(Plotter):
             self.setTickSpacingOnAxis(bax3)
 
             # Set the ylabel to the correct position:
-            bbox = ax.get_window_extent().transformed(plt.gcf().dpi_scale_trans.inverted())
+            bbox = ax.get_window_extent().transformed(ax.figure.dpi_scale_trans.inverted())
             width, height = bbox.width, bbox.height
             labelpady = self.decorator.labelPad[1] if self.decorator.labelPad is not None else Defaults.labelPadY
             baxpad = self.decorator.baxpad if self.decorator.baxpad is not None else Defaults.baxpad # Needs bugfix
@@ -390,5 +712,14 @@ class Scatter2D(Plotter):
                 bax2.minorticks_on()
 
 
+class CurveCollection(NamedTuple):
+    axis: object
+    lines: object # None if the dots are not connected
+    points: object
+    errorbars: object
 
 
+class Data2DArtists(NamedTuple):
+    scatter: object
+    line: object # None if the dots are not connected
+    errorbar: object # None without error bars
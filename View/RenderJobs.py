@@ -0,0 +1,132 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from matplotlib import rcParams
+
+import Module.Defaults as Defaults
+from DataCapsule.DataCapsules import Data2D, SmoothFunction2D
+from View.Plotter import ColorPlotter
+from View.View import View, PlotTypes
+
+# Render jobs describe a View completely (its subplots, insets, decorators and data capsules, the figure settings and
+# the plot defaults), so that it can be sent to another process and rendered there, headless, with its own
+# matplotlib state. Data capsules must be picklable; SmoothFunction2Ds whose function cannot be pickled (e.g. a fit of
+# a lambda) are evaluated when the job is made, see sampledOverlay.
+
+
+class SubplotJob(NamedTuple):
+    dataCapsules: list
+    plotType: PlotTypes
+    decorator: object
+    sharex: int
+    sharey: int
+    insets: list # SubplotJobs of the insets, in order
+
+
+class RenderJob(NamedTuple):
+    subplots: list
+    savepath: str
+    useTex: bool
+    amountOfColumns: int
+    figureSize: tuple
+    dpi: int
+    defaults: dict # Values of Module.Defaults when the job was made
+
+
+def renderJobFromView(view, savepath):
+    """Describes everything needed to render view to savepath."""
+    subplots = []
+    for subplot, insets in zip(view._subplots, view._insets):
+        insetJobs = [_subplotJob(inset, []) for inset in insets]
+        subplots.append(_subplotJob(subplot, insetJobs))
+
+    defaults = {name: value for name, value in vars(Defaults).items() if not name.startswith("_")}
+    return RenderJob(subplots=subplots, savepath=savepath, useTex=view.useTex,
+                     amountOfColumns=view.preferredAmountOfColumns, figureSize=view.preferredFigureSize,
+                     dpi=view.preferredDpi, defaults=defaults)
+
+
+def render(job):
+    """Renders a job headless and returns the path of the saved figure."""
+    for name, value in job.defaults.items():
+        setattr(Defaults, name, value)
+
+    view = View(useTex=job.useTex, headless=True)
+    view.preferredAmountOfColumns = job.amountOfColumns
+    view.preferredFigureSize = job.figureSize
+    view.preferredDpi = job.dpi
+
+    for subplot in job.subplots:
+        plotID = view.subplotFromDataCapsules(list(subplot.dataCapsules), subplot.plotType, subplot.decorator,
+                                              sharex=subplot.sharex, sharey=subplot.sharey)
+        for insetID, inset in enumerate(subplot.insets):
+            view.insetFromDataCapsules(list(inset.dataCapsules), inset.plotType, inset.decorator, plotID, insetID)
+
+    return view.plotAll(savepath=job.savepath)
+
+
+def renderAll(jobs, workers=None):
+    """Renders jobs in a pool of worker processes (by default one per core) and returns the saved paths, in the order
+    of jobs."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render, jobs))
+
+
+class SampledFunction():
+    """A function known only at sample points, linearly interpolated in between and NaN outside. Evaluated at the
+    sample points it returns the sampled values exactly."""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __call__(self, x):
+        return np.interp(x, self.x, self.y, left=np.nan, right=np.nan)
+
+
+def sampledOverlay(dataCapsule, x0, x1, scale):
+    """Returns a copy of a SmoothFunction2D with its function evaluated at the points where Scatter2D will draw it:
+    NPoints from x0 to x1 (in plot units, scale converts them to data units)."""
+    x = np.linspace(x0, x1, dataCapsule.NPoints) * scale
+    return SmoothFunction2D(SampledFunction(x, np.asarray(dataCapsule.func(x), dtype=float)), dataCapsule.NPoints,
+                            label=dataCapsule.label)
+
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def _subplotJob(subplot, insetJobs):
+    plotType = PlotTypes.ColorPlot if isinstance(subplot.plotter, ColorPlotter) else PlotTypes.Scatter2D
+    decorator = subplot.plotter.decorator
+
+    # Smooth functions span the decorator's xlim, or else the x-range drawn before them widened by the axes margins,
+    # as matplotlib autoscales (axes shared with other subplots are not accounted for):
+    dataCapsules = []
+    x0, x1 = np.inf, -np.inf
+    for dataCapsule in subplot.dataCapsules:
+        if isinstance(dataCapsule, Data2D) and np.size(dataCapsule.x) > 0:
+            x = np.asarray(dataCapsule.x, dtype=float) / decorator.xlabel.scale
+            x0, x1 = min(x0, np.nanmin(x)), max(x1, np.nanmax(x))
+        elif isinstance(dataCapsule, SmoothFunction2D):
+            if decorator.xlim is not None:
+                x0, x1 = decorator.xlim
+            elif x0 <= x1:
+                margin = rcParams["axes.xmargin"] * (x1 - x0)
+                x0, x1 = x0 - margin, x1 + margin
+
+            if not _picklable(dataCapsule.func):
+                if x0 > x1:
+                    raise TypeError("Cannot make a render job of the overlay {}: its function cannot be pickled and "
+                                    "there is no data or xlim to evaluate it on. Use a module-level function."
+                                    .format(dataCapsule.func))
+                dataCapsule = sampledOverlay(dataCapsule, x0, x1, decorator.xlabel.scale)
+        dataCapsules.append(dataCapsule)
+
+    return SubplotJob(dataCapsules=dataCapsules, plotType=plotType, decorator=decorator,
+                      sharex=subplot.sharex, sharey=subplot.sharey, insets=insetJobs)
@@ -7,6 +7,7 @@ import matplotlib.pyplot as plt
 import matplotlib
 from matplotlib import rc, rcParams, rcParamsDefault
 from View.Figure import Figure
+from time import perf_counter
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes, InsetPosition
 
 from enum import Enum, auto
@@ -20,12 +21,25 @@ class View():
     preferredFigureSize = (8.25, 4)
     preferredDpi = 600
     preferredBaxpad = .5
-
-    def __init__(self, useTex=False):
+    headless = False # Render without pyplot and never show; for batch rendering on machines without a display
+    printTimings = False # Print the time spent per subplot and phase after every plotAll
+
+    def __init__(self, useTex=False, headless=None):
+        """Headless: defaults to the headless class member."""
+        if headless is not None:
+            self.headless = headless
+        self.useTex = useTex
         self._subplots = []
         self._insets   = []
         self._axes = []
 
+        # State of the last plotAll, kept for update():
+        self.figure = None
+        self._insetAxes = []
+        self._plottedDataCapsules = []
+        self._plottedInsetDataCapsules = []
+        self.timings = [] # RenderTimings of the last plotAll
+
         if useTex:
             rc('font', **{'family': 'serif', 'serif': ['Times']})
             rc('text', usetex=True)
@@ -64,9 +78,9 @@ class View():
             self._insets[plotID].append(subplot)
 
     def makeAxes(self):
-        nrows, ncols = self.countRowsAndColumns(View.preferredAmountOfColumns)
-        dpi = View.preferredDpi
-        figsize = View.preferredFigureSize
+        nrows, ncols = self.countRowsAndColumns(self.preferredAmountOfColumns)
+        dpi = self.preferredDpi
+        figsize = self.preferredFigureSize
 
         sharex = self._generateSharexList(ncols)
         sharey = self._generateShareyList(ncols)
@@ -76,7 +90,7 @@ class View():
         print("Making a new set of axes using parameters:")
         print(nrows, ncols, dpi, figsize, sharex, sharey, bax, colorplot)
 
-        self.figure = Figure(nrows, ncols, dpi, figsize, sharex, sharey, bax, colorplot)
+        self.figure = Figure(nrows, ncols, dpi, figsize, sharex, sharey, bax, colorplot, headless=self.headless)
 
         return nrows, ncols
 
@@ -135,34 +149,88 @@ class View():
         return rows, columns
 
     def plotAll(self, savepath=None):
+        """Plots all subplots and saves the figure to savepath, if given, which is returned. In headless mode the
+        figure is not shown but released after saving, so that many figures can be rendered in one process."""
+        if self.headless and savepath is None:
+            raise ValueError("Headless plotting needs a savepath.")
+
+        self.timings = []
+        start = perf_counter()
         nrows, ncols = self.makeAxes()
+        self._timed("figure", "layout", start)
+        self._insetAxes = []
 
         for plotID, subplot in enumerate(self._subplots):
             print("Plotting subplot", plotID)
-            plotter = subplot.plotter
 
             # Collect the proper axes:
             row, col = self.plotIDToTuple(plotID, ncols)
             axesCollection = self.figure.axes[row][col]
 
-            # Plot all data:
-            for dataCapsule in subplot.dataCapsules:
-                plotter.plotDataCapsule(axesCollection.majorAx, dataCapsule, bax=axesCollection.brokenAx,
-                                        cax=axesCollection.colorAx)
-                plotter.decorate(axesCollection.majorAx, bax=axesCollection.brokenAx, cax=axesCollection.colorAx)
+            self._drawAndDecorate(subplot, "subplot " + str(plotID), axesCollection.majorAx,
+                                  bax=axesCollection.brokenAx, cax=axesCollection.colorAx)
 
-            self.handleInsets(self._insets[plotID], axesCollection.majorAx)
+            self._insetAxes.append(self.handleInsets(self._insets[plotID], axesCollection.majorAx, plotID=plotID))
+
+        self._plottedDataCapsules = [list(subplot.dataCapsules) for subplot in self._subplots]
+        self._plottedInsetDataCapsules = [[list(inset.dataCapsules) for inset in insets] for insets in self._insets]
 
         if savepath is not None:
-            plt.savefig(savepath, bbox_inches='tight')
+            start = perf_counter()
+            self.figure.figure.savefig(savepath, bbox_inches='tight')
+            self._timed("figure", "save", start)
+
+        if self.printTimings:
+            self.printTimingBreakdown()
 
-        plt.show()
+        if self.headless:
+            self._releaseFigure()
+        else:
+            plt.show()
         rcParams.update(rcParamsDefault)
 
-    def handleInsets(self, insets, parentAx):
+        return savepath
+
+    def _releaseFigure(self):
+        # Drops all references to the figure and its artists, so that it is freed
+        for subplot in self._subplots:
+            subplot.plotter.clearArtists()
+        for insets in self._insets:
+            for inset in insets:
+                inset.plotter.clearArtists()
+        self.figure = None
+        self._insetAxes = []
+
+    def _drawAndDecorate(self, subplot, name, ax, bax=None, cax=None):
+        """Draws all data capsules of a subplot first, and then decorates its axes once, so that the cost of
+        decorating (legend, secondary axes, ticks) does not grow with the amount of data capsules."""
+        plotter = subplot.plotter
+        plotter.clearArtists()
+
+        start = perf_counter()
+        plotter.plotDataCapsules(ax, subplot.dataCapsules, bax=bax, cax=cax)
+        self._timed(name, "draw", start)
+
+        if subplot.dataCapsules:
+            start = perf_counter()
+            plotter.decorate(ax, bax=bax, cax=cax)
+            self._timed(name, "decorate", start)
+
+    def _timed(self, name, phase, start):
+        self.timings.append(RenderTiming(name=name, phase=phase, seconds=perf_counter() - start))
+
+    def printTimingBreakdown(self):
+        print("Render time per phase:")
+        for timing in self.timings:
+            print("  {:<20} {:<9} {:8.3f} s".format(timing.name, timing.phase, timing.seconds))
+        print("  {:<30} {:8.3f} s".format("total", sum(timing.seconds for timing in self.timings)))
+
+    def handleInsets(self, insets, parentAx, plotID=0):
+        # Returns the axes of the insets
         rcParams.update({'font.size': 6})
+        insetAxes = []
         if insets:  # If not an empty list
-            for inset in insets:
+            for insetID, inset in enumerate(insets):
                 plotter = inset.plotter
 
                 loc = plotter.decorator.insetPositon if plotter.decorator.insetPositon is not None else Defaults.insetPosition
@@ -174,16 +242,75 @@ class View():
                     inset_ax = inset_axes(parentAx, width=width, height=height, loc=loc,
                                           borderpad=borderpad)
                 else:
-                    inset_ax = plt.axes([0, 0, 1, 1])
+                    inset_ax = parentAx.figure.add_axes([0, 0, 1, 1])
                     insetPosition = InsetPosition(parentAx, loc)
                     inset_ax.set_axes_locator(insetPosition)
 
-                for dataCapsule in inset.dataCapsules:
-                    plotter.plotDataCapsule(inset_ax, dataCapsule)
-                plotter.decorate(inset_ax)
+                self._drawAndDecorate(inset, "subplot " + str(plotID) + " inset " + str(insetID), inset_ax)
+                insetAxes.append(inset_ax)
 
         # Return to standard font size:
         rcParams.update({'font.size': 10})
+        return insetAxes
+
+    def update(self, savepath=None):
+        """Brings the figure of the last plotAll up to date with data capsules added to or replaced in its subplots and
+        insets since. Only new or replaced data capsules are drawn, all other artists are kept, which makes this fast
+        enough for live monitoring (with interactive mode, plt.ion(), so that plotAll does not block). If subplots or
+        insets were added, the whole figure is plotted again."""
+        if self.figure is None or not self._layoutUnchanged():
+            self.plotAll(savepath=savepath)
+            return
+
+        nrows, ncols = self.countRowsAndColumns(self.preferredAmountOfColumns)
+        for plotID, subplot in enumerate(self._subplots):
+            row, col = self.plotIDToTuple(plotID, ncols)
+            axesCollection = self.figure.axes[row][col]
+            self._updateSubplot(subplot, self._plottedDataCapsules[plotID], axesCollection.majorAx,
+                                bax=axesCollection.brokenAx, cax=axesCollection.colorAx)
+
+            rcParams.update({'font.size': 6})
+            for inset, plotted, insetAx in zip(self._insets[plotID], self._plottedInsetDataCapsules[plotID],
+                                               self._insetAxes[plotID]):
+                self._updateSubplot(inset, plotted, insetAx)
+            rcParams.update({'font.size': 10})
+
+        if savepath is not None:
+            self.figure.figure.savefig(savepath, bbox_inches='tight')
+
+        self.figure.figure.canvas.draw_idle()
+        self.figure.figure.canvas.flush_events()
+
+    def _updateSubplot(self, subplot, plottedDataCapsules, ax, bax=None, cax=None):
+        plotter = subplot.plotter
+        changed = False
+        for i, dataCapsule in enumerate(subplot.dataCapsules):
+            if i < len(plottedDataCapsules):
+                if dataCapsule is plottedDataCapsules[i]:
+                    continue
+                plotter.updateDataCapsule(i, ax, dataCapsule, cax=cax, bax=bax)
+                plottedDataCapsules[i] = dataCapsule
+            else:
+                plotter.plotDataCapsule(ax, dataCapsule, cax=cax, bax=bax)
+                plottedDataCapsules.append(dataCapsule)
+            changed = True
+
+        if changed:
+            plotter.refresh(ax, cax=cax, bax=bax)
+
+    def _layoutUnchanged(self):
+        # True if the subplots and insets are the ones of the last plotAll, and none lost data capsules
+        if len(self._subplots) != len(self._plottedDataCapsules):
+            return False
+        for plotID, subplot in enumerate(self._subplots):
+            if len(subplot.dataCapsules) < len(self._plottedDataCapsules[plotID]):
+                return False
+            if len(self._insets[plotID]) != len(self._plottedInsetDataCapsules[plotID]):
+                return False
+            for inset, plotted in zip(self._insets[plotID], self._plottedInsetDataCapsules[plotID]):
+                if len(inset.dataCapsules) < len(plotted):
+                    return False
+        return True
 
     def addDatacapsuleToSubplot(self, dataCapsule, subplotID):
         self._subplots[subplotID].dataCapsules.append(dataCapsule)
@@ -191,6 +318,12 @@ class View():
     def addDatacapsuleToInset(self, dataCapsule, subplotID, insetID):
         self._insets[subplotID][insetID].dataCapsules.append(dataCapsule)
 
+    def replaceDatacapsuleInSubplot(self, dataCapsule, subplotID, dataCapsuleID):
+        self._subplots[subplotID].dataCapsules[dataCapsuleID] = dataCapsule
+
+    def replaceDatacapsuleInInset(self, dataCapsule, subplotID, insetID, dataCapsuleID):
+        self._insets[subplotID][insetID].dataCapsules[dataCapsuleID] = dataCapsule
+
     def dataCapsule(self, subplotID, dataCapsuleID):
         return self._subplots[subplotID].dataCapsules[dataCapsuleID]
 
@@ -218,4 +351,9 @@ class Subplot(NamedTuple):
     dataCapsules: list
     plotter: Plotter
     sharex: int # PlotID of other subplot with which x-axis is shared. None if not implemented
-    sharey: int # PlotID of other subplot with which y-axis is shared. None if not implemented
\ No newline at end of file
+    sharey: int # PlotID of other subplot with which y-axis is shared. None if not implemented
+
+class RenderTiming(NamedTuple):
+    name: str # Part of the figure, e.g. "subplot 0"
+    phase: str # "layout", "draw", "decorate" or "save"
+    seconds: float
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from Model.ColumnCache import ColumnCache
+
+
+@pytest.fixture
+def measurementFile(tmp_path):
+    path = tmp_path / "measurement.dat"
+    path.write_text("a b\n1 2\n3 4\n")
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ColumnCache(str(tmp_path / "cache"), 1 << 20)
+
+
+def store(cache, path):
+    data = np.loadtxt(path, skiprows=1, ndmin=2).T
+    cache.store(path, ["a", "b"], data)
+    return data
+
+
+def test_hit(cache, measurementFile):
+    data = store(cache, measurementFile)
+    titles, cached = cache.load(measurementFile)
+    assert titles == ["a", "b"]
+    assert isinstance(cached, np.memmap)
+    assert np.array_equal(cached, data)
+
+
+def test_miss(cache, measurementFile):
+    assert cache.load(measurementFile) is None
+
+
+def test_invalidatedWhenSizeChanges(cache, measurementFile):
+    store(cache, measurementFile)
+    with open(measurementFile, 'a') as f:
+        f.write("5 6\n")
+    assert cache.load(measurementFile) is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_mtimeOnlyChangeKeepsEntry(cache, measurementFile):
+    store(cache, measurementFile)
+    stat = os.stat(measurementFile)
+    os.utime(measurementFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.load(measurementFile) is not None
+
+
+def test_invalidatedWhenContentChanges(cache, measurementFile):
+    store(cache, measurementFile)
+    stat = os.stat(measurementFile)
+    with open(measurementFile, 'w') as f:
+        f.write("a b\n1 2\n3 5\n") # Same size
+    os.utime(measurementFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache.load(measurementFile) is None
+
+
+def test_invalidatedByOtherFormatVersion(cache, measurementFile, monkeypatch):
+    store(cache, measurementFile)
+    monkeypatch.setattr(ColumnCache, "formatVersion", ColumnCache.formatVersion + 1)
+    assert cache.load(measurementFile) is None
+
+
+def test_evictsLeastRecentlyUsed(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / "measurement{}.dat".format(i)
+        path.write_text("a\n" + "1\n" * 1000)
+        paths.append(str(path))
+    data = np.ones((1, 1000))
+    entryBytes = data.nbytes + 1024
+
+    cache = ColumnCache(str(tmp_path / "cache"), int(2.5 * entryBytes))
+    cache.store(paths[0], ["a"], data)
+    cache.store(paths[1], ["a"], data)
+    cache.load(paths[0]) # Now more recently used than paths[1]
+    cache.store(paths[2], ["a"], data)
+
+    assert cache.load(paths[0]) is not None
+    assert cache.load(paths[1]) is None
+    assert cache.load(paths[2]) is not None
+
+
+def test_tooLargeTablesAreNotCached(tmp_path, measurementFile):
+    cache = ColumnCache(str(tmp_path / "cache"), 8)
+    store(cache, measurementFile)
+    assert cache.load(measurementFile) is None
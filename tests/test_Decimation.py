@@ -0,0 +1,43 @@
+import numpy as np
+
+from View.Decimation import decimationIndices
+
+
+def test_shortCurvesAreKept():
+    assert np.array_equal(decimationIndices(np.arange(10.0), 5), np.arange(10))
+
+
+def test_keepsEdgesAndExtremaOfEveryChunk():
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.standard_normal(10007))
+    y[5000] = 100.0 # A spike
+    amountOfChunks = 100
+    indices = decimationIndices(y, amountOfChunks)
+
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) <= 4 * amountOfChunks
+    chunkSize = int(np.ceil(len(y) / amountOfChunks))
+    kept = set(indices)
+    for start in range(0, len(y), chunkSize):
+        chunk = y[start:start + chunkSize]
+        end = start + len(chunk) - 1
+        assert {start, end, start + np.argmin(chunk), start + np.argmax(chunk)} <= kept
+    assert 5000 in kept
+
+
+def test_keepsOrderOfUpDownSweep():
+    up = np.linspace(-1, 1, 5000)
+    y = np.concatenate((up, up[::-1]))
+    indices = decimationIndices(y, 50)
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_extremaSkipNaN():
+    y = np.sin(np.arange(1000) / 7)
+    y[110:190] = np.nan # Within the chunk 100...199
+    y[300:400] = np.nan # A whole chunk
+    indices = decimationIndices(y, 10)
+    edges = (indices % 100 == 0) | (indices % 100 == 99)
+    assert (~edges).sum() > 0 and not np.isnan(y[indices[~edges]]).any()
+    assert [index for index in indices if 300 <= index < 400] == [300, 399]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from Model.MeasurementStore import MeasurementStore
+from Model.SingleMeasurement import SweepTypes
+
+
+def makeStore():
+    return MeasurementStore(("current", "voltage"), lambda index: index)
+
+
+def appendChunk(store, lengths, amountOfDevices=2, start=0.0):
+    """Appends single measurements of the given lengths; Bx counts the single measurements, the current the rows."""
+    lengths = np.asarray(lengths)
+    firstIndices = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    rows = np.arange(lengths.sum()) + start
+    Bx = np.repeat(np.arange(len(lengths)) + start, lengths).astype(float)
+    environment = [np.ones(len(rows)), np.ones(len(rows)), Bx, np.zeros(len(rows)), np.zeros(len(rows))]
+    store.append(firstIndices, environment, {"current": [rows + device for device in range(amountOfDevices)],
+                                             "voltage": [2 * rows + device for device in range(amountOfDevices)]})
+    return rows
+
+
+def test_appendMergesPendingChunks():
+    store = makeStore()
+    first = appendChunk(store, [3, 1, 4])
+    second = appendChunk(store, [2, 2], start=100)
+
+    assert len(store) == 5
+    assert np.array_equal(store.offsets, [0, 3, 4, 8, 10, 12])
+    assert np.array_equal(store.lengths, [3, 1, 4, 2, 2])
+    assert np.array_equal(store.column("current", 1), np.concatenate((first, second)) + 1)
+    assert np.array_equal(store.environmental(SweepTypes.B_X), [0, 1, 2, 100, 101])
+    assert store.amountOfDevices == 2
+    assert [list(segment) for segment in store.segments("voltage", 0)] == \
+           [[0, 2, 4], [6], [8, 10, 12, 14], [200, 202], [204, 206]]
+
+
+def test_columnsAreReadOnly():
+    store = makeStore()
+    appendChunk(store, [3, 3])
+    with pytest.raises(ValueError):
+        store.column("current")[0] = 1.0
+
+
+def test_versionAndSetColumn():
+    store = makeStore()
+    appendChunk(store, [3, 3])
+    version = store.version
+    store.setColumn("voltage", 0, np.zeros(6))
+    assert store.version > version
+    assert not store.column("voltage", 0).any()
+    with pytest.raises(ValueError):
+        store.setColumn("voltage", 0, np.zeros(5))
+
+
+def test_isRegularAndGrid():
+    store = makeStore()
+    appendChunk(store, [4, 4, 4])
+    assert store.isRegular()
+    grid = store.grid("current", 0)
+    assert grid.shape == (4, 3)
+    assert np.array_equal(grid[:, 1], store.segment("current", 0, 1))
+
+    appendChunk(store, [2])
+    assert not store.isRegular()
+    with pytest.raises(ValueError):
+        store.grid("current", 0)
+
+
+def test_differentAmountsOfDevices():
+    store = makeStore()
+    appendChunk(store, [3], amountOfDevices=2)
+    appendChunk(store, [3], amountOfDevices=1)
+    with pytest.raises(ValueError):
+        store.offsets
+
+
+def test_emptyStore():
+    store = makeStore()
+    assert len(store) == 0
+    assert not store.isRegular()
+    assert store.segments("current", 0) == []
+    assert len(store.column("current", 3)) == 0
+
+    # A chunk without single measurements still tells the amount of devices:
+    empty = [np.zeros(0)] * 5
+    store.append([], empty, {"current": [np.zeros(0)] * 3, "voltage": [np.zeros(0)] * 3})
+    assert len(store) == 0
+    assert store.amountOfDevices == 3
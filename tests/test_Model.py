@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from Model.Model import Model
+
+
+class BareModel(Model):
+    def loadDataFromFile(self, path):
+        pass
+
+
+@pytest.fixture
+def model():
+    return BareModel([])
+
+
+def test_derivativeOfUniformGrid(model):
+    x = np.linspace(0, 1, 21)
+    y = np.sin(3 * x)
+    dydx = model.derivative(x, y)
+    expected = [(y[i + 1] - y[i - 1]) / (x[i + 1] - x[i - 1]) for i in range(1, len(x) - 1)]
+    assert np.allclose(dydx[1:-1], expected)
+
+
+def test_derivativeOfQuadraticIsExactOnNonUniformGrid(model):
+    x = np.sort(np.random.default_rng(0).random(30))
+    assert np.allclose(model.derivative(x, 3 * x**2 - x), 6 * x - 1)
+
+
+def test_derivativeOfUpDownSweep(model):
+    # The current repeats at the turning points, where the old central difference is used:
+    up = np.linspace(-1, 1, 11)
+    x = np.concatenate((up, up[::-1], up))
+    y = 2 * x + 0.1 * x**2
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        dydx = model.derivative(x, y)
+    assert not np.isnan(dydx).any()
+    for i in np.flatnonzero(np.diff(x) == 0):
+        for j in (i, i + 1):
+            assert np.isclose(dydx[j], (y[j + 1] - y[j - 1]) / (x[j + 1] - x[j - 1]))
+
+
+def test_derivativeWithRepeatedEndPoints(model):
+    x = np.array([0.0, 0.0, 1.0, 2.0, 2.0])
+    assert np.allclose(model.derivative(x, 5 * x), 5)
+
+
+def test_derivativeOfGridAlongSharedAxis(model):
+    x = np.linspace(-1, 1, 15)
+    y = np.column_stack((x**2, np.sin(x), 4 * x))
+    dydx = model.derivative(x, y)
+    assert dydx.shape == y.shape
+    for column in range(y.shape[1]):
+        assert np.allclose(dydx[:, column], model.derivative(x, y[:, column]))
+    assert np.allclose(model.derivative(np.tile(x[:, np.newaxis], (1, 3)), y), dydx)
@@ -0,0 +1,252 @@
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from Model.SegmentOperations import segmentFirstTrue, segmentLastTrue, segmentArgmin, segmentThresholdCrossing, \
+    segmentSearchsorted, segmentWindows, segmentMonotonicRuns, segmentInterpolationWeights, segmentSort, \
+    segmentStatistics, segmentLinearFit
+
+# Every segment operation is compared with a plain loop over the segments, on ragged segments, up/down sweeps,
+# plateaus and single-point segments.
+
+
+def upDown(n):
+    up = np.linspace(-1, 1, n)
+    return np.concatenate((up, up[::-1][1:]))
+
+
+def makeSegments(seed):
+    rng = np.random.default_rng(seed)
+    segments = [rng.random(rng.integers(1, 30)) for _ in range(20)] # Ragged, unsorted
+    segments += [np.sort(rng.random(rng.integers(1, 30))) for _ in range(5)]
+    segments += [upDown(11), upDown(6)[::-1], np.concatenate((upDown(5), upDown(5)[1:]))]
+    segments += [rng.integers(0, 4, 12).astype(float), np.repeat(rng.random(4), 3)] # Plateaus
+    segments += [np.array([0.3]), np.array([0.7]), np.array([0.5, 0.5])] # Single points
+    order = rng.permutation(len(segments))
+    segments = [segments[i] for i in order]
+    offsets = np.concatenate(([0], np.cumsum([len(segment) for segment in segments])))
+    return np.concatenate(segments), offsets
+
+
+@pytest.fixture(params=[0, 1, 2])
+def segmented(request):
+    return makeSegments(request.param)
+
+
+def spans(offsets):
+    return zip(offsets[:-1], offsets[1:])
+
+
+def test_firstAndLastTrue(segmented):
+    y, offsets = segmented
+    condition = y > 0.6
+    first = [a + np.flatnonzero(condition[a:b])[0] if condition[a:b].any() else -1 for a, b in spans(offsets)]
+    last = [a + np.flatnonzero(condition[a:b])[-1] if condition[a:b].any() else -1 for a, b in spans(offsets)]
+    assert np.array_equal(segmentFirstTrue(condition, offsets), first)
+    assert np.array_equal(segmentLastTrue(condition, offsets), last)
+
+
+def test_argmin(segmented):
+    y, offsets = segmented
+    expected = [a + np.argmin(y[a:b]) for a, b in spans(offsets)]
+    assert np.array_equal(segmentArgmin(y, offsets), expected)
+
+
+def test_argminIgnoresNaN():
+    values = np.array([np.nan, 2.0, 1.0, 1.0, np.nan, np.nan, 3.0])
+    offsets = np.array([0, 4, 6, 7])
+    assert np.array_equal(segmentArgmin(values, offsets), [2, 4, 6])
+
+
+def referenceThresholdCrossing(y, z, threshold, polarity, interpolate):
+    if polarity > 0:
+        considered = list(np.flatnonzero(y > 0))
+    elif polarity < 0:
+        considered = list(np.flatnonzero(y < 0))[::-1] # Scanned backwards
+    else:
+        considered = list(range(len(y)))
+    if len(considered) == 0:
+        return np.nan
+
+    for scanIndex, k in enumerate(considered):
+        crossed = z[k] < threshold if polarity < 0 and threshold <= 0 else z[k] > threshold
+        if crossed:
+            if interpolate and scanIndex > 0:
+                p = considered[scanIndex - 1]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    yInterpolated = y[p] + (threshold - z[p]) * (y[k] - y[p]) / (z[k] - z[p])
+                if np.isfinite(yInterpolated):
+                    return yInterpolated
+            return y[k]
+    return y[considered[0]]
+
+
+@pytest.mark.parametrize("polarity", [1, -1, 0])
+@pytest.mark.parametrize("interpolate", [False, True])
+@pytest.mark.parametrize("threshold", [0.5, -0.2])
+def test_thresholdCrossing(segmented, polarity, interpolate, threshold):
+    y, offsets = segmented
+    y = y - 0.5
+    z = np.random.default_rng(3).random(len(y)) - 0.3
+    expected = [referenceThresholdCrossing(y[a:b], z[a:b], threshold, polarity, interpolate) for a, b in spans(offsets)]
+    result = segmentThresholdCrossing(y, z, offsets, threshold, polarity=polarity, interpolate=interpolate)
+    assert np.allclose(result, expected, equal_nan=True)
+
+
+def test_searchsorted(segmented):
+    y, offsets = segmented
+    y = np.concatenate([np.sort(y[a:b]) for a, b in spans(offsets)])
+    queries = np.concatenate((np.linspace(-0.2, 1.2, 15), y[:5]))
+    expected = [[a + np.searchsorted(y[a:b], query) for query in queries] for a, b in spans(offsets)]
+    assert np.array_equal(segmentSearchsorted(y, offsets, queries), expected)
+
+
+@pytest.mark.parametrize("halfWidth", [0, 2, 5])
+def test_windows(segmented, halfWidth):
+    y, offsets = segmented
+    centers = segmentArgmin(y, offsets)
+    indices, valid = segmentWindows(centers, offsets, halfWidth)
+    width = 2 * halfWidth + 1
+    for i, (a, b) in enumerate(spans(offsets)):
+        first = min(max(centers[i] - halfWidth, a), max(b - width, a))
+        assert np.array_equal(indices[i][valid[i]], np.arange(first, min(first + width, b)))
+
+
+def referenceMonotonicRuns(y):
+    runs = []
+    start = 0
+    direction = 0
+    for i in range(1, len(y)):
+        step = np.sign(y[i] - y[i - 1])
+        if step == 0:
+            continue
+        if direction != 0 and step != direction:
+            runs.append((start, i - 1))
+            start = i - 1
+        direction = step
+    runs.append((start, len(y) - 1))
+    return [np.arange(last, first - 1, -1) if y[last] < y[first] else np.arange(first, last + 1)
+            for first, last in runs]
+
+
+def test_monotonicRuns(segmented):
+    y, offsets = segmented
+    indices, runOffsets, runSegments = segmentMonotonicRuns(y, offsets)
+    expected = [(segment, a + run) for segment, (a, b) in enumerate(spans(offsets))
+                for run in referenceMonotonicRuns(y[a:b])]
+
+    assert len(runSegments) == len(expected)
+    for run, (segment, runIndices) in enumerate(expected):
+        assert runSegments[run] == segment
+        assert np.array_equal(indices[runOffsets[run]:runOffsets[run + 1]], runIndices)
+
+
+def test_monotonicRunsOfUpDownSweep():
+    y = np.array([0.0, 1.0, 2.0, 2.0, 1.0, 0.0, 1.0])
+    indices, runOffsets, runSegments = segmentMonotonicRuns(y, np.array([0, len(y)]))
+    assert [list(run) for run in np.split(indices, runOffsets[1:-1])] == [[0, 1, 2, 3], [5, 4, 3], [5, 6]]
+    assert np.array_equal(runSegments, [0, 0, 0])
+
+
+def queriesFor(y):
+    return np.concatenate((np.linspace(-1.3, 1.3, 27), y[:10], [0.25, 0.5]))
+
+
+def test_nearestWeights(segmented):
+    y, offsets = segmented
+    queries = queriesFor(y)
+    lower, upper, weight, outOfRange = segmentInterpolationWeights(y, offsets, queries, nearest=True)
+
+    expected = [[a + np.argmin(np.abs(y[a:b] - query)) for query in queries] for a, b in spans(offsets)]
+    assert np.array_equal(lower, expected)
+    assert np.array_equal(upper, expected)
+    assert not weight.any()
+    assert np.array_equal(outOfRange, [[query < y[a:b].min() or query > y[a:b].max() for query in queries]
+                                       for a, b in spans(offsets)])
+
+
+def referenceInterpolation(y, z, query):
+    # The first measured pair of points bracketing the query, else the nearest point:
+    for i in range(len(y) - 1):
+        if min(y[i], y[i + 1]) <= query <= max(y[i], y[i + 1]):
+            if y[i] == y[i + 1]:
+                return z[i]
+            return z[i] + (query - y[i]) / (y[i + 1] - y[i]) * (z[i + 1] - z[i])
+    return z[np.argmin(np.abs(y - query))]
+
+
+def test_interpolationWeights(segmented):
+    y, offsets = segmented
+    z = np.random.default_rng(4).random(len(y))
+    queries = queriesFor(y)
+    lower, upper, weight, outOfRange = segmentInterpolationWeights(y, offsets, queries)
+
+    expected = [[referenceInterpolation(y[a:b], z[a:b], query) for query in queries] for a, b in spans(offsets)]
+    assert np.allclose((1 - weight) * z[lower] + weight * z[upper], expected)
+
+
+def test_interpolationStaysOnOneBranch():
+    # A hysteretic IV: the up branch has z = y, the down branch z = y + 1
+    up = np.linspace(0, 1, 11)
+    y = np.concatenate((up, up[::-1][1:]))
+    z = np.concatenate((up, up[::-1][1:] + 1))
+    offsets = np.array([0, len(y)])
+    for nearest, expected in [(True, 0.5), (False, 0.52)]:
+        lower, upper, weight, _ = segmentInterpolationWeights(y, offsets, np.array([0.52]), nearest=nearest)
+        assert np.isclose((1 - weight[0, 0]) * z[lower[0, 0]] + weight[0, 0] * z[upper[0, 0]], expected)
+
+
+def test_interpolationWeightsWithoutSegments():
+    lower, upper, weight, outOfRange = segmentInterpolationWeights(np.zeros(0), np.zeros(1, dtype=np.int64),
+                                                                   np.array([0.0, 1.0]))
+    assert lower.shape == upper.shape == weight.shape == outOfRange.shape == (0, 2)
+
+
+def test_sort(segmented):
+    y, offsets = segmented
+    values = np.column_stack((y, -y))
+    values[::7, 1] = np.nan
+    expected = np.concatenate([np.sort(values[a:b], axis=0) for a, b in spans(offsets)])
+    assert np.array_equal(segmentSort(values, offsets), expected, equal_nan=True)
+
+
+def test_statistics(segmented):
+    y, offsets = segmented
+    values = np.column_stack((y, y**2))
+    values[::5, 0] = np.nan
+    values[offsets[0]:offsets[1], 1] = np.nan # A segment without valid elements
+    statistics = segmentStatistics(values, offsets)
+
+    with np.errstate(all='ignore'), pytest.warns(RuntimeWarning):
+        segments = [values[a:b] for a, b in spans(offsets)]
+        assert np.allclose(statistics.mean, [np.nanmean(segment, axis=0) for segment in segments], equal_nan=True)
+        assert np.allclose(statistics.std, [np.nanstd(segment, axis=0) for segment in segments], equal_nan=True)
+        assert np.allclose(statistics.median, [np.nanmedian(segment, axis=0) for segment in segments],
+                           equal_nan=True)
+    assert np.array_equal(statistics.count, [np.sum(~np.isnan(segment), axis=0) for segment in segments])
+
+
+def test_statisticsOfOneQuantity(segmented):
+    y, offsets = segmented
+    statistics = segmentStatistics(y, offsets)
+    assert statistics.median.shape == (len(offsets) - 1,)
+    assert np.allclose(statistics.median, [np.median(y[a:b]) for a, b in spans(offsets)])
+
+
+def test_linearFit(segmented):
+    y, offsets = segmented
+    x = np.random.default_rng(5).random(len(y))
+    fit = segmentLinearFit(x, y, offsets)
+
+    for i, (a, b) in enumerate(spans(offsets)):
+        if b - a < 2:
+            assert np.isnan(fit.slope[i])
+            continue
+        reference = linregress(x[a:b], y[a:b])
+        assert np.isclose(fit.slope[i], reference.slope)
+        assert np.isclose(fit.intercept[i], reference.intercept)
+        if b - a > 2:
+            assert np.isclose(fit.slopeError[i], reference.stderr)
+            assert np.isclose(fit.interceptError[i], reference.intercept_stderr)
+        else:
+            assert np.isnan(fit.slopeError[i])
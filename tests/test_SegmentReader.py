@@ -0,0 +1,78 @@
+import numpy as np
+
+from Model.SegmentReader import SegmentReader
+
+# The first column is the setpoint; a single measurement starts wherever it changes.
+
+
+def segmentStarts(table):
+    setpoint = table.data[0]
+    return np.concatenate(([0], np.flatnonzero(setpoint[1:] != setpoint[:-1]) + 1))
+
+
+def rowsText(setpoints):
+    return "".join("{} {}\n".format(setpoint, row) for row, setpoint in enumerate(setpoints))
+
+
+def makeReader(path, text, chunkBytes=1 << 20):
+    path.write_text("setpoint value\n" + text)
+    return SegmentReader(str(path), segmentStarts, chunkBytes)
+
+
+def setpointsOf(tables):
+    return [list(table.data[0]) for table in tables]
+
+
+def test_holdsBackLastSegment(tmp_path):
+    reader = makeReader(tmp_path / "live.dat", rowsText([0, 0, 1, 1, 1, 2]))
+    assert setpointsOf(reader.readAvailable()) == [[0, 0, 1, 1, 1]]
+    assert reader.titles == ["setpoint", "value"]
+
+    # The carried-forward single measurement is handed out once the next one starts:
+    with open(reader.path, 'a') as f:
+        f.write("2 6\n3 7\n")
+    assert setpointsOf(reader.readAvailable()) == [[2, 2]]
+    assert setpointsOf(reader.readAvailable(final=True)) == [[3]]
+
+
+def test_partialLineIsReadAgain(tmp_path):
+    reader = makeReader(tmp_path / "live.dat", "0 0\n0 1\n1 2\n1 3\n2 4")
+    assert setpointsOf(reader.readAvailable()) == [[0, 0]]
+    offset = reader.offset
+
+    with open(reader.path, 'a') as f:
+        f.write("0\n")
+    assert setpointsOf(reader.readAvailable()) == [[1, 1]]
+    assert reader.offset > offset
+
+    tables = list(reader.readAvailable(final=True))
+    assert [list(table.data[1]) for table in tables] == [[40.0]]
+
+
+def test_finalReadsUnterminatedLastLine(tmp_path):
+    reader = makeReader(tmp_path / "done.dat", "0 0\n1 1\n1 2")
+    tables = list(reader.readAvailable(final=True))
+    assert setpointsOf(tables) == [[0], [1, 1]]
+    assert reader.atEnd
+
+
+def test_incompleteHeader(tmp_path):
+    path = tmp_path / "live.dat"
+    path.write_text("setpoint val")
+    reader = SegmentReader(str(path), segmentStarts)
+    assert list(reader.readAvailable()) == []
+    assert reader.titles is None
+
+
+def test_smallChunksNeverSplitSegments(tmp_path):
+    rng = np.random.default_rng(0)
+    setpoints = np.repeat(np.arange(40), rng.integers(1, 8, 40))
+    reader = makeReader(tmp_path / "big.dat", rowsText(setpoints), chunkBytes=64)
+
+    tables = list(reader.readAvailable(final=True))
+    assert len(tables) > 1
+    data = np.concatenate([table.data for table in tables], axis=1)
+    assert np.array_equal(data[0], setpoints)
+    assert np.array_equal(data[1], np.arange(len(setpoints)))
+    for first, second in zip(tables[:-1], tables[1:]):
+        assert first.data[0, -1] != second.data[0, 0]